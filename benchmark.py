@@ -0,0 +1,396 @@
+
+
+import argparse
+import datetime
+import json
+import os
+import platform
+import shutil
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import pandas as pd
+import db_pool
+import generate_data
+import kpi_engine
+import memory_backend
+
+# --- Pipeline Benchmark ---
+# Runs the whole pipeline (generate_data.py -> load_to_sqlite.py -> the
+# dashboard's queries) at one or more scale factors and records, per stage,
+# the wall time, CPU time, peak RSS and rows/sec. A scale factor multiplies the
+# base employee pool, number of simulated days and/or number of buildings
+# (--axes); 1x is the simulation as configured in generate_data.py.
+#
+# Every stage runs in its own subprocess so its peak RSS (from os.wait4) is its
+# own and not the harness's. The query stages replay every query template the
+# dashboard issues (sidebar lookups, the kpi_engine reads, floor peaks) for a
+# set of filter selections at each location level, on connections configured
+# like the dashboard's pool but with no result cache.
+#
+# The startup stage times a cold dashboard session against a budget; see
+# "Startup Budget" below.
+#
+# Results are written as JSON together with the git commit, so two runs can be
+# compared with --baseline.
+
+RESULTS_FILE = 'benchmark_results.json'
+SCALES = [1]
+SCALE_AXES = ['employees', 'days', 'buildings']
+BASE_DAYS = (generate_data.end_date - generate_data.start_date).days + 1
+SEED = 42
+QUERY_REPEATS = 5
+STAGES = ['generate', 'load', 'queries', 'memory', 'startup']
+RAW_FILES = {'csv': 'raw_workspace_data.csv', 'parquet': 'raw_workspace_data.parquet'}
+
+def scenario(scale, axes, base_employees, base_days):
+    """Returns the generator parameters for one scale factor."""
+    n_days = base_days * scale if 'days' in axes else base_days
+    return {
+        'scale': scale,
+        'employees': base_employees * scale if 'employees' in axes else base_employees,
+        'start_date': generate_data.start_date.isoformat(),
+        'end_date': (generate_data.start_date + datetime.timedelta(days=n_days - 1)).isoformat(),
+        'days': n_days,
+        'building_scale': scale if 'buildings' in axes else 1,
+    }
+
+def run_stage(command, log_path):
+    """
+    Runs one stage as a subprocess, logging its output, and returns its wall
+    time, CPU time and peak RSS.
+    """
+    with open(log_path, 'a') as log:
+        log.write(f"$ {' '.join(command)}\n")
+        log.flush()
+        started = time.perf_counter()
+        process = subprocess.Popen(command, stdout=log, stderr=subprocess.STDOUT)
+        _, status, usage = os.wait4(process.pid, 0)
+        wall = time.perf_counter() - started
+    process.returncode = os.waitstatus_to_exitcode(status)
+    if process.returncode != 0:
+        raise RuntimeError(f"'{' '.join(command)}' exited with {process.returncode}; see {log_path}")
+    # ru_maxrss is in KiB on Linux and in bytes on macOS.
+    rss_bytes = usage.ru_maxrss if sys.platform == 'darwin' else usage.ru_maxrss * 1024
+    return {
+        'wall_seconds': round(wall, 3),
+        'cpu_seconds': round(usage.ru_utime + usage.ru_stime, 3),
+        'peak_rss_mb': round(rss_bytes / 2**20, 1),
+    }
+
+# --- Query Stages ---
+def benchmark_filters(conn):
+    """
+    Filter selections at every location level (all, first country, its first
+    city and building), over the dashboard's default last 30 days and the
+    whole history.
+    """
+    min_day, max_day = conn.execute("SELECT MIN(Day), MAX(Day) FROM bookings").fetchone()
+    country, city, building = conn.execute(
+        "SELECT Country, City, Building FROM buildings ORDER BY Country, City, Building LIMIT 1"
+    ).fetchone()
+    locations = {
+        'all': (None, None, None),
+        'country': (country, None, None),
+        'city': (country, city, None),
+        'building': (country, city, building),
+    }
+    ranges = {'30d': (max(min_day, max_day - 30), max_day), 'full': (min_day, max_day)}
+    return {
+        f"{level}/{range_name}": kpi_engine.build_filters(start_day, end_day, *location)
+        for range_name, (start_day, end_day) in ranges.items()
+        for level, location in locations.items()
+    }
+
+def query_templates(conn):
+    """Returns {name: (query, params)} for every query the dashboard issues."""
+    templates = {
+        'metadata/filter_domain': (kpi_engine.FILTER_DOMAIN_QUERY, ()),
+        'metadata/generation': ("SELECT Value FROM db_metadata WHERE Key = 'generation'", ()),
+        'metadata/bucket_minutes': (kpi_engine.BUCKET_MINUTES_QUERY, ()),
+    }
+    for name, filters in benchmark_filters(conn).items():
+        params = kpi_engine.query_params(filters)
+        templates[f"daily/{name}"] = (kpi_engine.daily_query(filters), params)
+        templates[f"bitmaps/{name}"] = (kpi_engine.bitmap_query(filters), params)
+        templates[f"spaces/{name}"] = (kpi_engine.spaces_query(filters), params)
+        templates[f"floor_peaks/{name}"] = (kpi_engine.floor_peaks_query(filters), params)
+    return templates
+
+def time_calls(call, repeats):
+    """Runs call() `repeats` times; returns (timings in ms, last result)."""
+    timings = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        result = call()
+        timings.append((time.perf_counter() - started) * 1000)
+    return timings, result
+
+def timing_row(name, timings, rows):
+    return {
+        'name': name,
+        'rows': rows,
+        'min_ms': round(min(timings), 3),
+        'median_ms': round(statistics.median(timings), 3),
+        'max_ms': round(max(timings), 3),
+    }
+
+def run_query_benchmark(db_file, repeats=QUERY_REPEATS):
+    """Times every dashboard query template and the KPI derivation per selection (SQLite backend)."""
+    conn = db_pool.open_connection(db_file)
+    results = []
+    for name, (query, params) in query_templates(conn).items():
+        timings, rows = time_calls(lambda: conn.execute(query, params).fetchall(), repeats)
+        results.append(timing_row(name, timings, len(rows)))
+    # A whole page render's data work: the fetch plus every derived frame.
+    for name, filters in benchmark_filters(conn).items():
+        def render():
+            data = kpi_engine.fetch_kpi_data(conn, filters)
+            kpi_engine.summarize_kpis(data)
+            return kpi_engine.occupancy_trend(data, 'Daily')
+        timings, trend = time_calls(render, repeats)
+        results.append(timing_row(f"page/{name}", timings, len(trend)))
+    conn.close()
+    return results
+
+def run_memory_benchmark(db_file, repeats=QUERY_REPEATS):
+    """Times loading the in-memory backend and answering every selection from it."""
+    conn = db_pool.open_connection(db_file)
+    timings, store = time_calls(lambda: memory_backend.load_store(conn), 1)
+    results = [timing_row('memory/load_store', timings, len(store['columns']['Day']))]
+    for name, filters in benchmark_filters(conn).items():
+        def render():
+            data = memory_backend.fetch_kpi_data(store, filters)
+            kpi_engine.summarize_kpis(data)
+            return kpi_engine.occupancy_trend(data, 'Daily')
+        timings, trend = time_calls(render, repeats)
+        results.append(timing_row(f"memory/page/{name}", timings, len(trend)))
+    conn.close()
+    return results
+
+# --- Startup Budget ---
+# A cold dashboard session: a fresh process imports Streamlit and renders the
+# first page (default filters, no API key) with Streamlit's AppTest, which
+# runs dashboard.py and all of its imports in this process. It must fit in
+# STARTUP_BUDGET_SECONDS and must not import the modules that are only needed
+# on demand (LAZY_MODULES). --check-startup runs this against a database and
+# exits non-zero if either check fails.
+
+STARTUP_BUDGET_SECONDS = float(os.environ.get('STARTUP_BUDGET_SECONDS', 2.0))
+LAZY_MODULES = ['google.generativeai']
+RENDER_TIMEOUT = 120  # seconds
+
+def run_startup_benchmark(db_file):
+    """Renders the dashboard once in this (fresh) process and returns the startup timings."""
+    started = time.perf_counter()
+    from streamlit.testing.v1 import AppTest
+    import_seconds = time.perf_counter() - started
+    os.environ['DASHBOARD_DB'] = os.path.abspath(db_file)
+    app = AppTest.from_file(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'dashboard.py'),
+                            default_timeout=RENDER_TIMEOUT)
+    render_started = time.perf_counter()
+    app.run()
+    render_seconds = time.perf_counter() - render_started
+    if app.exception:
+        raise RuntimeError(f"The dashboard failed to render: {app.exception[0].message}")
+    startup_seconds = import_seconds + render_seconds
+    eager_imports = [name for name in LAZY_MODULES if name in sys.modules]
+    return {
+        'import_seconds': round(import_seconds, 3),
+        'first_render_seconds': round(render_seconds, 3),
+        'startup_seconds': round(startup_seconds, 3),
+        'budget_seconds': STARTUP_BUDGET_SECONDS,
+        'eager_imports': eager_imports,
+        'within_budget': startup_seconds <= STARTUP_BUDGET_SECONDS and not eager_imports,
+    }
+
+def check_startup(db_file, log_path=None):
+    """Runs the startup stage in a fresh process; returns its result and prints the verdict."""
+    output = tempfile.NamedTemporaryFile(suffix='.json', delete=False).name
+    log_path = log_path or os.devnull
+    try:
+        stage = run_stage([sys.executable, os.path.abspath(__file__), '--stage', 'startup', '--db', db_file,
+                           '--output', output], log_path)
+        with open(output) as f:
+            startup = json.load(f)
+    finally:
+        os.remove(output)
+    startup.update(stage)
+    verdict = 'within' if startup['within_budget'] else 'OVER'
+    print(f"   - Startup {startup['startup_seconds']:.2f}s (imports {startup['import_seconds']:.2f}s, first render "
+          f"{startup['first_render_seconds']:.2f}s): {verdict} the {STARTUP_BUDGET_SECONDS:.1f}s budget.")
+    if startup['eager_imports']:
+        print(f"   - Imported at startup although only needed on demand: {', '.join(startup['eager_imports'])}")
+    return startup
+
+# --- Harness ---
+def git_commit():
+    """Returns the current commit (suffixed '-dirty' with local changes), or None outside git."""
+    here = os.path.dirname(os.path.abspath(__file__))
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=here,
+                                capture_output=True, text=True, check=True).stdout.strip()
+        dirty = subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], cwd=here,
+                               capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return f"{commit}-dirty" if dirty else commit
+
+def run_scenario(params, workdir, output_format, workers, repeats, stages):
+    """Runs the pipeline stages for one scenario and returns its results."""
+    raw_path = os.path.join(workdir, RAW_FILES[output_format])
+    db_file = os.path.join(workdir, 'workspace_analytics.db')
+    log_path = os.path.join(workdir, 'benchmark.log')
+    python = sys.executable
+    here = os.path.dirname(os.path.abspath(__file__))
+    result = dict(params, stages={}, queries=[])
+
+    print(f"   - Generating {params['employees']:,} employees x {params['days']} days "
+          f"(building scale {params['building_scale']})...")
+    result['stages']['generate'] = run_stage([
+        python, os.path.join(here, 'generate_data.py'), '--seed', str(SEED), '--workers', str(workers),
+        '--employees', str(params['employees']), '--start', params['start_date'], '--end', params['end_date'],
+        '--building-scale', str(params['building_scale']),
+        '--format', output_format, '--output', raw_path,
+    ], log_path)
+
+    print("   - Loading into SQLite...")
+    result['stages']['load'] = run_stage([
+        python, os.path.join(here, 'load_to_sqlite.py'), '--input', raw_path, '--db', db_file,
+    ], log_path)
+
+    conn = sqlite3.connect(db_file)
+    result['bookings'] = conn.execute("SELECT COUNT(*) FROM bookings").fetchone()[0]
+    result['buildings'] = conn.execute("SELECT COUNT(*) FROM buildings").fetchone()[0]
+    result['spaces'] = conn.execute("SELECT COUNT(*) FROM spaces").fetchone()[0]
+    conn.close()
+    result['db_size_mb'] = round(os.path.getsize(db_file) / 2**20, 1)
+    for stage in ('generate', 'load'):
+        result['stages'][stage]['rows'] = result['bookings']
+
+    for stage in [s for s in ('queries', 'memory') if s in stages]:
+        print(f"   - Running the {stage} stage...")
+        stage_output = os.path.join(workdir, f"{stage}.json")
+        result['stages'][stage] = run_stage([
+            python, os.path.abspath(__file__), '--stage', stage, '--db', db_file,
+            '--repeats', str(repeats), '--output', stage_output,
+        ], log_path)
+        with open(stage_output) as f:
+            timings = json.load(f)
+        result['stages'][stage]['rows'] = sum(row['rows'] for row in timings)
+        result['queries'] += timings
+
+    if 'startup' in stages:
+        print("   - Running the startup stage...")
+        result['startup'] = check_startup(db_file, log_path)
+        result['stages']['startup'] = {key: result['startup'][key] for key in ('wall_seconds', 'cpu_seconds', 'peak_rss_mb')}
+        result['stages']['startup']['rows'] = 0
+
+    for stage in result['stages'].values():
+        stage['rows_per_second'] = round(stage['rows'] / stage['wall_seconds']) if stage['rows'] else None
+    return result
+
+def run_benchmark(scales=SCALES, axes=SCALE_AXES, base_employees=generate_data.TOTAL_EMPLOYEES, base_days=BASE_DAYS,
+                  output_format='csv', workers=1, repeats=QUERY_REPEATS, stages=STAGES, workdir=None, keep=False):
+    """Runs every scale factor and returns the results document."""
+    results = {
+        'commit': git_commit(),
+        'created': datetime.datetime.now(datetime.timezone.utc).isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'settings': {
+            'scales': scales, 'axes': axes, 'base_employees': base_employees, 'base_days': base_days,
+            'format': output_format, 'workers': workers, 'repeats': repeats, 'seed': SEED,
+        },
+        'scenarios': [],
+    }
+    for i, scale in enumerate(scales, 1):
+        params = scenario(scale, axes, base_employees, base_days)
+        print(f"{i}. Scale {scale}x ({', '.join(axes)})...")
+        scenario_dir = tempfile.mkdtemp(prefix=f"scale-{scale}x-", dir=workdir)
+        try:
+            results['scenarios'].append(run_scenario(params, scenario_dir, output_format, workers, repeats, stages))
+        finally:
+            if keep:
+                print(f"   - Kept the files in '{scenario_dir}'.")
+            else:
+                shutil.rmtree(scenario_dir, ignore_errors=True)
+        print_scenario(results['scenarios'][-1])
+    return results
+
+def print_scenario(result):
+    stages = pd.DataFrame(result['stages']).T
+    print(f"   {result['bookings']:,} bookings, {result['buildings']} buildings, {result['db_size_mb']} MB database")
+    print(stages[['wall_seconds', 'cpu_seconds', 'peak_rss_mb', 'rows_per_second']].to_string())
+
+def compare_results(baseline, results):
+    """Prints the change in stage wall times and query medians against a baseline results file."""
+    print(f"Comparing with {baseline.get('commit')} ({baseline.get('created')}):")
+    previous = {s['scale']: s for s in baseline['scenarios']}
+    for current in results['scenarios']:
+        old = previous.get(current['scale'])
+        if old is None:
+            continue
+        rows = []
+        for stage, timing in current['stages'].items():
+            if stage in old['stages']:
+                rows.append((f"stage/{stage}", old['stages'][stage]['wall_seconds'] * 1000, timing['wall_seconds'] * 1000))
+        old_queries = {q['name']: q['median_ms'] for q in old['queries']}
+        rows += [(q['name'], old_queries[q['name']], q['median_ms']) for q in current['queries'] if q['name'] in old_queries]
+        table = pd.DataFrame(rows, columns=['name', 'baseline_ms', 'current_ms']).set_index('name')
+        table['change_pct'] = (table['current_ms'] / table['baseline_ms'] - 1) * 100
+        print(f"Scale {current['scale']}x:")
+        print(table.round(1).to_string())
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the generate/load/query pipeline at several scale factors.")
+    parser.add_argument('--scales', type=int, nargs='+', default=SCALES, help="Scale factors, e.g. 1 10 100.")
+    parser.add_argument('--axes', nargs='+', choices=SCALE_AXES, default=SCALE_AXES,
+                        help="What a scale factor multiplies (default: employees, days and buildings).")
+    parser.add_argument('--base-employees', type=int, default=generate_data.TOTAL_EMPLOYEES,
+                        help="Employees at 1x.")
+    parser.add_argument('--base-days', type=int, default=BASE_DAYS, help="Simulated days at 1x.")
+    parser.add_argument('--format', choices=sorted(RAW_FILES), default='csv', dest='output_format',
+                        help="Raw data format passed between the generator and the loader.")
+    parser.add_argument('--workers', type=int, default=1, help="Generator worker processes.")
+    parser.add_argument('--repeats', type=int, default=QUERY_REPEATS, help="Runs per query (median is reported).")
+    parser.add_argument('--stages', nargs='+', choices=STAGES, default=STAGES,
+                        help="Stages to run; generate and load always run.")
+    parser.add_argument('--workdir', default=None, help="Directory for the generated files (default: system temp).")
+    parser.add_argument('--keep', action='store_true', help="Keep the generated data and databases.")
+    parser.add_argument('--baseline', default=None, help="Results file of an earlier run to compare against.")
+    parser.add_argument('--check-startup', action='store_true',
+                        help="Only time a cold dashboard start against --db and exit non-zero if it is over budget.")
+    parser.add_argument('--db', default=kpi_engine.DB_FILE, help="Database for --check-startup.")
+    parser.add_argument('--output', default=RESULTS_FILE, help="Results file (JSON).")
+    # Used by the harness to run a query stage in its own process.
+    parser.add_argument('--stage', choices=['queries', 'memory', 'startup'], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.stage:
+        if args.stage == 'startup':
+            result = run_startup_benchmark(args.db)
+        elif args.stage == 'queries':
+            result = run_query_benchmark(args.db, args.repeats)
+        else:
+            result = run_memory_benchmark(args.db, args.repeats)
+        with open(args.output, 'w') as f:
+            json.dump(result, f)
+        raise SystemExit(0)
+    if args.check_startup:
+        print(f"1. Timing a cold dashboard start against '{args.db}'...")
+        raise SystemExit(0 if check_startup(args.db)['within_budget'] else 1)
+
+    results = run_benchmark(args.scales, args.axes, args.base_employees, args.base_days, args.output_format,
+                            args.workers, args.repeats, args.stages, args.workdir, args.keep)
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"Wrote the results to '{args.output}'.")
+    if args.baseline:
+        with open(args.baseline) as f:
+            compare_results(json.load(f), results)
@@ -1,12 +1,14 @@
 
 import streamlit as st
 import pandas as pd
-import sqlite3
-import plotly.express as px
 import os
-import json
-import google.generativeai as genai
-import numpy as np
+import time
+import kpi_engine
+import db_pool
+import query_cache
+import query_log
+import insights
+import memory_backend
 
 # --- Page Setup ---
 st.set_page_config(page_title="Workplace Analytics Dashboard", layout="wide")
@@ -18,86 +20,198 @@ st.sidebar.header("API Configuration")
 api_key = st.sidebar.text_input("Enter your Gemini API Key", type="password")
 
 # --- Configuration & Initialization ---
-DB_FILE = 'workspace_analytics.db'
-llm_model = None
-
-if api_key:
-    try:
-        genai.configure(api_key=api_key)
-        llm_model = genai.GenerativeModel('gemini-pro') # Or your preferred model
-        st.sidebar.success("API Key configured successfully!")
-    except Exception as e:
-        st.sidebar.error(f"Error configuring the AI model: {e}")
-else:
-    st.sidebar.warning("Please enter your Gemini API Key to enable AI features.")
+DB_FILE = os.environ.get('DASHBOARD_DB', 'workspace_analytics.db')
+# 'sqlite' answers the KPIs from the rollup tables; 'memory' keeps the booking
+# columns resident in this process (see memory_backend.py).
+BACKEND = os.environ.get('DASHBOARD_BACKEND', 'sqlite')
+
+# 'stub' answers AI requests with a local stand-in model instead of Gemini.
+INSIGHTS_MODEL = os.environ.get('INSIGHTS_MODEL', insights.DEFAULT_MODEL)
+INSIGHT_POLL_SECONDS = 1
 
+# Plotly is only imported when a chart is drawn, so sessions pay for it only
+# once there is something to plot.
+def plotly_express():
+    import plotly.express as px
+    return px
 
 # --- AI Insight Generation ---
-def convert_to_json_serializable(obj):
-    """Recursively convert non-serializable data types to serializable ones."""
-    if isinstance(obj, dict):
-        return {k: convert_to_json_serializable(v) for k, v in obj.items()}
-    elif isinstance(obj, list):
-        return [convert_to_json_serializable(i) for i in obj]
-    elif isinstance(obj, (np.integer, np.int64)):
-        return int(obj)
-    elif isinstance(obj, (np.floating, np.float64)):
-        return float(obj)
-    elif isinstance(obj, np.ndarray):
-        return obj.tolist()
-    elif pd.isna(obj):
-        return None
-    return obj
-
-def generate_insights(data_summary):
-    """Generates insights using the configured generative AI model."""
-    if not llm_model:
-        return "AI Model not available. Please enter your API key in the sidebar."
-
-    serializable_summary = convert_to_json_serializable(data_summary)
-    prompt = f"""
-    You are a senior Workspace Analytics consultant for HSBC. Your task is to provide data-driven insights based on a JSON summary from the Workplace Analytics Dashboard.
-
-    **Dashboard Data Summary:**
-    {json.dumps(serializable_summary, indent=2)}
-
-    **Your Task:**
-    Identify the 2-3 most critical and actionable insights from this data. For each insight, provide a specific data point that backs it up and a concrete recommendation.
-
-    **Output Format (Use Markdown):**
-    **Insight 1:** [A clear, one-sentence insight about a key trend or anomaly.]
-    *   **Data Point:** [The specific metric from the data that supports your insight.]
-    *   **Recommendation:** [A concrete, actionable suggestion.]
-    """
-    try:
-        response = llm_model.generate_content(prompt)
-        return response.text
-    except Exception as e:
-        return f"An error occurred while generating insights: {e}"
+# Insights are generated on a background worker and cached on disk by summary
+# and model (see insights.py). One service (and worker pool) per model is
+# shared by all sessions; only the lightweight client is kept per API key.
+# The Gemini SDK (and its gRPC stack) is only imported by the worker when it
+# first calls the model.
+@st.cache_resource
+def get_insight_service(model_name):
+    return insights.create_insight_service(model_name)
+
+@st.cache_resource
+def get_insight_client(api_key, model_name):
+    if model_name == 'stub':
+        return insights.stub_client()
+    return insights.gemini_client(api_key, model_name)
+
+ai_enabled = bool(api_key) or INSIGHTS_MODEL == 'stub'
+if INSIGHTS_MODEL == 'stub':
+    st.sidebar.info("AI insights use the local stub model (INSIGHTS_MODEL=stub).")
+elif api_key:
+    st.sidebar.success("API Key entered; the AI model is set up when insights are requested.")
+else:
+    st.sidebar.warning("Please enter your Gemini API Key to enable AI features.")
+
+@st.fragment(run_every=INSIGHT_POLL_SECONDS)
+def poll_insight(service, key):
+    """Re-checks a pending insight without rerunning the page; reruns it once the insight is done."""
+    status, _ = insights.insight_status(service, key)
+    if status == 'pending':
+        st.info("Analyzing data and generating insights in the background... The rest of the dashboard stays usable.")
+    else:
+        st.rerun()
 
 # --- Database Connection & Caching ---
-@st.cache_data(ttl=600)
-def run_query(query):
-    """Run a SQL query and return the result as a DataFrame."""
+# All sessions share one pool of read-only connections (see db_pool.py).
+@st.cache_resource
+def create_connection_pool(db_file):
+    return db_pool.create_pool(db_file)
+
+def get_pool():
+    """Returns the shared connection pool, stopping the app if the database is missing."""
     if not os.path.exists(DB_FILE):
         st.error(f"Database file not found at '{DB_FILE}'. Please run `load_to_sqlite.py` first.")
         st.stop()
-    conn = sqlite3.connect(DB_FILE)
-    df = pd.read_sql_query(query, conn)
-    conn.close()
-    return df
+    return create_connection_pool(DB_FILE)
+
+# Query results are shared by all sessions and kept until a load bumps the data
+# generation (see query_cache.py).
+@st.cache_resource
+def get_query_cache():
+    return query_cache.create_cache()
+
+# Independent queries run concurrently on a shared thread pool, each on its own
+# pooled connection; set QUERY_WORKERS to change the degree of parallelism.
+@st.cache_resource
+def get_query_executor():
+    return db_pool.create_executor()
+
+# Every query's time, rows, cache hit/miss and plan go to a log shared by all
+# sessions and to JSON log lines; see query_log.py.
+@st.cache_resource
+def get_query_log():
+    query_log.configure_logging()
+    return query_log.create_query_log()
+
+# Looked up once per rerun in the script thread; the query helpers below may
+# run on executor threads, which cannot call Streamlit.
+pool = get_pool()
+cache = get_query_cache()
+executor = get_query_executor()
+qlog = get_query_log()
+
+def run_query(query, params=(), name=None, context=None, fetch=None, cached=True):
+    """
+    Run a parameterized SQL query and return the result as a DataFrame. The
+    call is recorded in the query log under `name`, with `context` (e.g. the
+    selected filters) added to slow-query warnings.
+
+    `fetch(conn)` replaces the DataFrame read for helpers that run `query`
+    themselves (the result is cached under the helper's name), and
+    cached=False always runs the query, bypassing the query cache.
+    """
+    name = name or ' '.join(query.split())[:60]
+    if fetch is None:
+        fetch = lambda conn: pd.read_sql_query(query, conn, params=params)
+        key = query_cache.cache_key(query, params)
+    else:
+        key = query_cache.cache_key(f"{fetch.__module__}.{fetch.__name__}", params)
+    missed = []
+    def compute():
+        missed.append(True)
+        with db_pool.connection(pool) as conn:
+            return query_log.profile(qlog, conn, name, query, params, fetch, context)
+    if not cached:
+        return compute()
+    started = time.perf_counter()
+    result = query_cache.get_or_compute(cache, data_generation, key, compute)
+    if not missed:
+        query_log.record(qlog, name, query, params, 'hit', (time.perf_counter() - started) * 1000,
+                         query_log.result_rows(result), context=context)
+    return result
+
+def read_data_generation():
+    """Reads the current data generation; checked once per rerun, so never cached."""
+    return run_query(query_cache.GENERATION_QUERY, name='generation', fetch=query_cache.read_generation, cached=False)
+
+data_generation = read_data_generation()
+
+def load_filter_domain():
+    """Date bounds and locations for the sidebar, as precomputed by the loader."""
+    return run_query(kpi_engine.FILTER_DOMAIN_QUERY, name='filter_domain', fetch=kpi_engine.read_filter_domain)
+
+# The in-memory store is loaded once per process and data generation and is
+# shared by all sessions.
+@st.cache_resource(max_entries=1)
+def load_memory_store(generation):
+    with db_pool.connection(pool) as conn:
+        return memory_backend.load_store(conn)
+
+def load_kpi_data(filters):
+    """Fetches the data behind every KPI and chart for one filter selection."""
+    # The chart reads run on the query pool together with the KPI reads; with
+    # the memory backend they are the only ones that go to SQLite.
+    queries = kpi_engine.chart_queries(filters)
+    fetchers = kpi_engine.chart_fetchers(filters)
+    if BACKEND != 'memory':
+        queries.update(kpi_engine.kpi_queries(filters))
+        fetchers.update(kpi_engine.kpi_fetchers(filters))
+    params = kpi_engine.query_params(filters)
+    missed = []
+    def compute():
+        missed.append(True)
+        return db_pool.fetch_concurrently(pool, executor, {
+            name: (lambda conn, name=name, fetch=fetch: query_log.profile(
+                qlog, conn, f"kpi/{name}", queries[name], params, fetch, filters))
+            for name, fetch in fetchers.items()
+        })
+    started = time.perf_counter()
+    key = query_cache.cache_key('kpi_engine.fetch_kpi_data', filters)
+    data = query_cache.get_or_compute(cache, data_generation, key, compute)
+    if not missed:
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        for name, query in queries.items():
+            query_log.record(qlog, f"kpi/{name}", query, params, 'hit', elapsed_ms,
+                             query_log.result_rows(data[name]), context=filters)
+    if BACKEND == 'memory':
+        data = {**memory_backend.fetch_kpi_data(load_memory_store(data_generation), filters), **data}
+    return data
+
+# --- Schema Helpers ---
+# Bookings store dates as day numbers (days since 1970-01-01); see load_to_sqlite.py.
+EPOCH = kpi_engine.EPOCH
+
+def to_day_number(date):
+    """Converts a date to the day number stored in the bookings table."""
+    return (date - EPOCH).days
+
+def from_day_number(day):
+    """Converts a stored day number back to a date."""
+    return kpi_engine.day_to_date(day)
 
 # --- Sidebar Filters ---
 st.sidebar.header("Dashboard Filters")
 
-max_date_df = run_query("SELECT MAX(Date) as MaxDate FROM bookings")
-max_date = pd.to_datetime(max_date_df['MaxDate'].iloc[0])
-default_start_date = max_date - pd.Timedelta(days=30)
+# The date bounds and the Country/City/Building lists come from one small
+# metadata row written by the loader instead of queries over bookings.
+filter_domain = load_filter_domain()
+locations = pd.DataFrame(filter_domain['locations'], columns=['Country', 'City', 'Building'])
+min_date = pd.to_datetime(from_day_number(filter_domain['min_day']))
+max_date = pd.to_datetime(from_day_number(filter_domain['max_day']))
+# The last 30 days, or the whole history if it is shorter.
+default_start_date = max(min_date, max_date - pd.Timedelta(days=30))
 
 date_range = st.sidebar.date_input(
     "Select Date Range",
     value=(default_start_date, max_date),
-    min_value=pd.to_datetime(run_query("SELECT MIN(Date) as MinDate FROM bookings")['MinDate'].iloc[0]),
+    min_value=min_date,
     max_value=max_date,
 )
 
@@ -106,75 +220,39 @@ if len(date_range) != 2:
     st.stop()
 
 start_date, end_date = date_range
-start_date_str = start_date.strftime('%Y-%m-%d')
-end_date_str = end_date.strftime('%Y-%m-%d')
+start_day = to_day_number(start_date)
+end_day = to_day_number(end_date)
 
-countries = run_query("SELECT DISTINCT Country FROM spaces ORDER BY Country")
-selected_country = st.sidebar.selectbox("Country", countries['Country'].unique(), index=None, placeholder="All Countries")
+selected_country = st.sidebar.selectbox("Country", locations['Country'].unique(), index=None, placeholder="All Countries")
 
 if selected_country:
-    cities = run_query(f"SELECT DISTINCT City FROM spaces WHERE Country = '{selected_country}' ORDER BY City")
+    cities = locations[locations['Country'] == selected_country]
     selected_city = st.sidebar.selectbox("City", cities['City'].unique(), index=None, placeholder="All Cities")
 else:
     selected_city = None
 
 if selected_city:
-    buildings = run_query(f"SELECT DISTINCT Building FROM spaces WHERE City = '{selected_city}' ORDER BY Building")
+    buildings = cities[cities['City'] == selected_city]
     selected_building = st.sidebar.selectbox("Building", buildings['Building'].unique(), index=None, placeholder="All Buildings")
 else:
     selected_building = None
 
-# --- Build WHERE clauses ---
-base_where_conditions = [
-    "b.Booking_Status = 'Confirmed'",
-    f"b.Date BETWEEN '{start_date_str}' AND '{end_date_str}'"
-]
-space_where_conditions = []
-no_show_where_conditions = [f"b.Date BETWEEN '{start_date_str}' AND '{end_date_str}'"]
-
-if selected_building:
-    location_filter = f"s.Building = '{selected_building}'"
-    space_location_filter = f"Building = '{selected_building}'"
-    base_where_conditions.append(location_filter)
-    space_where_conditions.append(space_location_filter)
-    no_show_where_conditions.append(location_filter)
-elif selected_city:
-    location_filter = f"s.City = '{selected_city}'"
-    space_location_filter = f"City = '{selected_city}'"
-    base_where_conditions.append(location_filter)
-    space_where_conditions.append(space_location_filter)
-    no_show_where_conditions.append(location_filter)
-elif selected_country:
-    location_filter = f"s.Country = '{selected_country}'"
-    space_location_filter = f"Country = '{selected_country}'"
-    base_where_conditions.append(location_filter)
-    space_where_conditions.append(space_location_filter)
-    no_show_where_conditions.append(location_filter)
-
-where_clause = "WHERE " + " AND ".join(base_where_conditions)
-space_where_clause = "WHERE " + " AND ".join(space_where_conditions) if space_where_conditions else ""
-no_show_where_clause = "WHERE " + " AND ".join(no_show_where_conditions) if no_show_where_conditions else ""
-
-base_query = f"FROM bookings b JOIN spaces s ON b.Space_ID = s.Space_ID JOIN employees e ON b.Employee_ID = e.Employee_ID {where_clause}"
-
 # --- Pre-calculate all dataframes ---
-peak_occupancy_df = run_query(f"SELECT COUNT(DISTINCT b.Employee_ID) as Occupancy {base_query}")
-total_spaces_df = run_query(f"SELECT COUNT(DISTINCT Space_ID) as TotalSpaces FROM spaces {space_where_clause}")
-avg_daily_users_df = run_query(f"SELECT AVG(DailyUsers) as AvgUsers FROM (SELECT COUNT(DISTINCT b.Employee_ID) as DailyUsers {base_query} GROUP BY Date) as DailyCounts")
-no_show_df = run_query(f"SELECT CAST(SUM(CASE WHEN Booking_Status = 'No-Show' THEN 1 ELSE 0 END) AS REAL) / COUNT(*) * 100 as NoShowRate FROM bookings b JOIN spaces s ON b.Space_ID = s.Space_ID {no_show_where_clause}")
-adhoc_df = run_query(f"SELECT CAST(SUM(CASE WHEN Activity_Type = 'Check-in' THEN 1 ELSE 0 END) AS REAL) / COUNT(*) * 100 as AdhocRate {base_query}")
-day_of_week_df = run_query(f"SELECT CASE strftime('%w', daily.Date) WHEN '0' THEN 'Sunday' WHEN '1' THEN 'Monday' WHEN '2' THEN 'Tuesday' WHEN '3' THEN 'Wednesday' WHEN '4' THEN 'Thursday' WHEN '5' THEN 'Friday' ELSE 'Saturday' END as DayOfWeek, AVG(daily.Occupancy) as AvgOccupancy FROM (SELECT Date, COUNT(DISTINCT b.Employee_ID) as Occupancy {base_query} GROUP BY Date) as daily GROUP BY DayOfWeek ORDER BY strftime('%w', daily.Date)")
-space_type_df = run_query(f"SELECT s.Space_Type, COUNT(*) as BookingCount {base_query} GROUP BY s.Space_Type ORDER BY BookingCount DESC")
+# One fetch per filter selection; every KPI and chart below is derived from it
+# in memory (see kpi_engine.py).
+filters = kpi_engine.build_filters(start_day, end_day, selected_country, selected_city, selected_building)
+kpi_data = load_kpi_data(filters)
+kpis = kpi_engine.summarize_kpis(kpi_data)
+day_of_week_df = kpis['day_of_week_df']
+space_type_df = kpis['space_type_df']
 
 # --- Display KPIs and Charts ---
 st.header("Key Performance Indicators")
 kpi_cols = st.columns(4)
-peak_occupancy = peak_occupancy_df['Occupancy'].iloc[0] if not peak_occupancy_df.empty else 0
-total_spaces = total_spaces_df['TotalSpaces'].iloc[0]
-avg_daily_users = avg_daily_users_df['AvgUsers'].iloc[0] if not avg_daily_users_df.empty and avg_daily_users_df['AvgUsers'].iloc[0] is not None else 0
-avg_utilization = (avg_daily_users / total_spaces) * 100 if total_spaces > 0 else 0
-no_show_rate = no_show_df['NoShowRate'].iloc[0] if not no_show_df.empty and no_show_df['NoShowRate'].iloc[0] is not None else 0
-adhoc_rate = adhoc_df['AdhocRate'].iloc[0] if not adhoc_df.empty and adhoc_df['AdhocRate'].iloc[0] is not None else 0
+peak_occupancy = kpis['peak_occupancy']
+avg_utilization = kpis['avg_utilization']
+no_show_rate = kpis['no_show_rate']
+adhoc_rate = kpis['adhoc_rate']
 
 kpi_cols[0].metric("Peak Daily Occupancy", f"{peak_occupancy:,}")
 kpi_cols[1].metric("Average Daily Utilization", f"{avg_utilization:.1f}%")
@@ -185,13 +263,11 @@ st.divider()
 
 st.header("Occupancy & Utilization Trends")
 agg_level = st.radio("Aggregate data by:", ('Daily', 'Weekly', 'Monthly'), horizontal=True, key='agg_level')
-date_format = '%Y-%m-%d' if agg_level == 'Daily' else ('%Y-%W' if agg_level == 'Weekly' else '%Y-%m')
 title = f'{agg_level} Occupancy Over Time'
-occupancy_trend_query = f"SELECT strftime('{date_format}', Date) as AggDate, COUNT(DISTINCT b.Employee_ID) as Occupancy {base_query} GROUP BY AggDate ORDER BY AggDate"
-occupancy_trend_df = run_query(occupancy_trend_query)
+occupancy_trend_df = kpi_engine.occupancy_trend(kpi_data, agg_level)
 
 if not occupancy_trend_df.empty:
-    fig1 = px.line(occupancy_trend_df, x='AggDate', y='Occupancy', title=title, labels={'Occupancy': 'Number of Employees', 'AggDate': 'Date'})
+    fig1 = plotly_express().line(occupancy_trend_df, x='AggDate', y='Occupancy', title=title, labels={'Occupancy': 'Number of Employees', 'AggDate': 'Date'})
     st.plotly_chart(fig1, use_container_width=True)
 else:
     st.warning("No occupancy data available for the selected filters.")
@@ -201,34 +277,96 @@ st.divider()
 st.header("Space & Department Analysis")
 analysis_cols = st.columns(2)
 if not day_of_week_df.empty:
-    fig2 = px.bar(day_of_week_df, x='DayOfWeek', y='AvgOccupancy', title='Average Occupancy by Day of Week', labels={'AvgOccupancy': 'Avg. Number of Employees'})
+    fig2 = plotly_express().bar(day_of_week_df, x='DayOfWeek', y='AvgOccupancy', title='Average Occupancy by Day of Week', labels={'AvgOccupancy': 'Avg. Number of Employees'})
     analysis_cols[0].plotly_chart(fig2, use_container_width=True)
 else:
     analysis_cols[0].warning("No data for day-of-week analysis.")
 if not space_type_df.empty:
-    fig3 = px.bar(space_type_df, x='Space_Type', y='BookingCount', title='Bookings by Space Type', labels={'BookingCount': 'Number of Bookings'})
+    fig3 = plotly_express().bar(space_type_df, x='Space_Type', y='BookingCount', title='Bookings by Space Type', labels={'BookingCount': 'Number of Bookings'})
     analysis_cols[1].plotly_chart(fig3, use_container_width=True)
 
 st.divider()
 
+st.header("Floor Sizing: Peak Concurrent Occupancy")
+# Precomputed by load_to_sqlite.py from booking start times and an assumed
+# dwell time per space type (see intraday_peaks.py).
+floor_peaks_df = kpi_engine.floor_peaks(kpi_data['floor_peaks'])
+bucket_minutes = kpi_data['bucket_minutes']
+if not floor_peaks_df.empty:
+    fig4 = plotly_express().bar(floor_peaks_df, x='Peak_Utilization', y='Floor_Label', orientation='h',
+                  hover_data=['Peak_Occupancy', 'Seats', 'Peak_Date', 'Peak_Time'],
+                  title='Highest Simultaneous Occupancy vs. Seats (Busiest Floors)',
+                  labels={'Peak_Utilization': 'Peak Concurrent Utilization (%)', 'Floor_Label': ''})
+    fig4.update_yaxes(autorange='reversed')
+    st.plotly_chart(fig4, use_container_width=True)
+    if bucket_minutes is not None:
+        st.caption(f"Occupancy counted in {bucket_minutes}-minute buckets, assuming each booking "
+                   "lasts a typical dwell time for its space type.")
+else:
+    st.warning("No intraday peak data available for the selected filters.")
+
+st.divider()
+
 # --- AI-Powered Analysis Section ---
 st.header("AI-Powered Analysis")
-if not llm_model:
+if not ai_enabled:
     st.warning("Please enter your Gemini API Key in the sidebar to use this feature.")
 else:
+    service = get_insight_service(INSIGHTS_MODEL)
+    data_summary = {
+        "kpis": {
+            "peak_daily_occupancy": peak_occupancy,
+            "avg_daily_utilization_percent": round(avg_utilization, 2),
+            "no_show_rate_percent": round(no_show_rate, 2),
+            "adhoc_booking_rate_percent": round(adhoc_rate, 2)
+        },
+        "avg_occupancy_by_day": day_of_week_df.to_dict(orient='records'),
+        "bookings_by_space_type": space_type_df.to_dict(orient='records'),
+        "busiest_floors_by_peak_concurrency": floor_peaks_df.head(5)[
+            ['Building', 'Floor', 'Space_Type', 'Peak_Occupancy', 'Seats', 'Peak_Utilization']
+        ].to_dict(orient='records'),
+    }
+    insight_key = insights.summary_key(data_summary, service['model'])
     if st.button("✨ Generate Insights & Recommendations"):
-        with st.spinner("Analyzing data and generating insights... (This may take a moment)"):
-            data_summary = {
-                "kpis": {
-                    "peak_daily_occupancy": peak_occupancy,
-                    "avg_daily_utilization_percent": round(avg_utilization, 2),
-                    "no_show_rate_percent": round(no_show_rate, 2),
-                    "adhoc_booking_rate_percent": round(adhoc_rate, 2)
-                },
-                "avg_occupancy_by_day": day_of_week_df.to_dict(orient='records'),
-                "bookings_by_space_type": space_type_df.to_dict(orient='records'),
-            }
-            report = generate_insights(data_summary)
+        client = get_insight_client(api_key, INSIGHTS_MODEL)
+        st.session_state['insight_key'] = insights.request_insight(service, client, data_summary)
+
+    # Only the insight for the current view is shown; changing a filter hides it.
+    if st.session_state.get('insight_key') == insight_key:
+        status, report = insights.insight_status(service, insight_key)
+        if status == 'pending':
+            poll_insight(service, insight_key)
+        elif status == 'ready':
             st.markdown(report)
+        elif status == 'error':
+            st.error(report)
+        else:
+            st.info("This insight is no longer cached. Click the button to generate it again.")
     else:
         st.info("Click the button to get an AI-powered analysis of the current data view.")
+
+# --- Diagnostics ---
+with st.sidebar.expander("Connection Pool"):
+    st.json(db_pool.pool_stats(pool))
+with st.sidebar.expander("Query Cache"):
+    st.json(query_cache.cache_stats(cache))
+if ai_enabled:
+    with st.sidebar.expander("AI Insights"):
+        st.json(insights.insight_stats(get_insight_service(INSIGHTS_MODEL)))
+if st.sidebar.checkbox("Show query debug panel", key='query_debug'):
+    with st.sidebar.expander("Query Log", expanded=True):
+        st.json(query_log.log_stats(qlog))
+        st.dataframe(query_log.query_summary(qlog), hide_index=True)
+        st.caption(f"Over the last {query_log.MAX_ENTRIES} queries of all sessions; slow = over {qlog['slow_ms']:.0f} ms "
+                   "on a cache miss. Full_Scan marks plans that read a whole table without an index.")
+        for entry in query_log.recent_entries(qlog, limit=20):
+            flag = ' ⚠ full scan' if entry['full_scans'] else ''
+            with st.container(border=True):
+                st.markdown(f"**{entry['name']}** · {entry['cache']} · {entry['duration_ms']:.1f} ms · "
+                            f"{entry['rows']:,} rows{flag}")
+                st.code('\n'.join(entry['plan']) or '(no plan recorded)', language=None)
+if BACKEND == 'memory':
+    with st.sidebar.expander("In-Memory Backend"):
+        usage = memory_backend.memory_usage(load_memory_store(data_generation))
+        st.dataframe(pd.DataFrame({'Column': list(usage), 'Bytes': list(usage.values())}), hide_index=True)
+        st.caption(f"Total: {sum(usage.values()) / 1024 ** 2:,.1f} MB")
@@ -0,0 +1,237 @@
+
+
+import concurrent.futures
+import contextlib
+import os
+import queue
+import sqlite3
+import threading
+import time
+import urllib.parse
+
+# --- Read-Only Connection Pool ---
+# The dashboard only reads the database, so every Streamlit session shares a
+# small pool of read-only connections instead of opening a new one on every
+# query. Connections are opened lazily up to the pool size; when all of them
+# are checked out, callers wait for one to be returned.
+#
+# Connections use a mode=ro URI (not immutable=1), so they still see writes
+# made through other connections, and PRAGMA query_only guards against writes. Each one
+# keeps its own page cache and memory-maps the database file, so repeated
+# queries are served from memory rather than disk reads.
+#
+# The loader publishes a new database by renaming a finished file over the old
+# one (see load_to_sqlite.py). Open connections keep reading the old file,
+# which stays consistent until they close, so every checkout compares the
+# file's identity (device and inode) with the one the pool was opened on. When
+# it has changed, idle connections are closed and connections still in use are
+# closed when they are returned; the next checkout opens the new file.
+# Closing a connection frees its slot without putting anything in the idle
+# queue, so callers waiting for a connection wake up every WAIT_SLICE seconds
+# to check whether they may open one instead.
+
+POOL_SIZE = 8
+CHECKOUT_TIMEOUT = 30  # seconds
+WAIT_SLICE = 0.05  # seconds
+READ_PRAGMAS = {
+    'query_only': 'ON',
+    'mmap_size': 1 << 30,     # Map up to 1 GB of the database file
+    'cache_size': -131072,    # 128 MB page cache per connection
+    'temp_store': 'MEMORY',
+}
+
+def database_uri(db_file):
+    """Returns a read-only SQLite URI for a database file."""
+    return f"file:{urllib.parse.quote(os.path.abspath(db_file))}?mode=ro"
+
+def open_connection(db_file):
+    """Opens one read-only connection with the read PRAGMAs applied."""
+    # Connections are handed between Streamlit's script threads, but only one
+    # thread uses a connection at a time.
+    conn = sqlite3.connect(database_uri(db_file), uri=True, check_same_thread=False)
+    for pragma, value in READ_PRAGMAS.items():
+        conn.execute(f"PRAGMA {pragma} = {value}")
+    return conn
+
+def file_identity(db_file):
+    """Identifies the database file on disk; a published load replaces it with a new one."""
+    try:
+        st = os.stat(db_file)
+    except OSError:
+        return None
+    return (st.st_dev, st.st_ino)
+
+def create_pool(db_file, size=POOL_SIZE):
+    """Creates an empty pool; connections are opened on first use."""
+    return {
+        'db_file': db_file,
+        'size': size,
+        'idle': queue.LifoQueue(),
+        'lock': threading.Lock(),
+        'file_id': file_identity(db_file),
+        'opened_on': {},  # Connection -> identity of the file it was opened on
+        'stats': {
+            'file_changes': 0,
+            'reopened': 0,
+            'connections': 0,
+            'checkouts': 0,
+            'in_use': 0,
+            'waits': 0,
+            'wait_seconds': 0.0,
+            'max_wait_seconds': 0.0,
+        },
+    }
+
+def discard(pool, conn):
+    """Closes a connection to a database file that has been replaced."""
+    conn.close()
+    with pool['lock']:
+        pool['opened_on'].pop(conn, None)
+        pool['stats']['connections'] -= 1
+        pool['stats']['reopened'] += 1
+
+def is_stale(pool, conn):
+    with pool['lock']:
+        return pool['opened_on'].get(conn) != pool['file_id']
+
+def refresh(pool):
+    """Notices a newly published database file and closes the idle connections to the old one."""
+    identity = file_identity(pool['db_file'])
+    with pool['lock']:
+        if identity == pool['file_id']:
+            return False
+        pool['file_id'] = identity
+        pool['stats']['file_changes'] += 1
+    keep = []
+    while True:
+        try:
+            conn = pool['idle'].get_nowait()
+        except queue.Empty:
+            break
+        if is_stale(pool, conn):
+            discard(pool, conn)
+        else:
+            keep.append(conn)
+    for conn in reversed(keep):
+        pool['idle'].put(conn)
+    return True
+
+def open_pooled(pool):
+    """Opens a connection in a slot already counted in stats['connections']."""
+    file_id = pool['file_id']
+    try:
+        conn = open_connection(pool['db_file'])
+    except Exception:
+        with pool['lock']:
+            pool['stats']['connections'] -= 1
+        raise
+    with pool['lock']:
+        pool['opened_on'][conn] = file_id
+    return conn
+
+def acquire(pool):
+    """Takes an idle connection, opens a new one, or waits for one to be returned."""
+    stats = pool['stats']
+    refresh(pool)
+    started = time.perf_counter()
+    waited = False
+    while True:
+        try:
+            conn = pool['idle'].get_nowait()
+        except queue.Empty:
+            with pool['lock']:
+                opening = stats['connections'] < pool['size']
+                if opening:
+                    stats['connections'] += 1
+            if opening:
+                conn = open_pooled(pool)
+                break
+            remaining = CHECKOUT_TIMEOUT - (time.perf_counter() - started)
+            if remaining <= 0:
+                raise TimeoutError(f"No database connection became free within {CHECKOUT_TIMEOUT}s.")
+            waited = True
+            try:
+                conn = pool['idle'].get(timeout=min(remaining, WAIT_SLICE))
+            except queue.Empty:
+                continue  # A discarded connection may have freed a slot
+        if not is_stale(pool, conn):
+            break
+        # Opened on a file that has since been replaced; its slot is free again.
+        discard(pool, conn)
+    with pool['lock']:
+        if waited:
+            wait = time.perf_counter() - started
+            stats['waits'] += 1
+            stats['wait_seconds'] += wait
+            stats['max_wait_seconds'] = max(stats['max_wait_seconds'], wait)
+        stats['checkouts'] += 1
+        stats['in_use'] += 1
+    return conn
+
+def release(pool, conn):
+    """Returns a connection to the pool (or closes it if its file has been replaced)."""
+    with pool['lock']:
+        pool['stats']['in_use'] -= 1
+    if is_stale(pool, conn):
+        discard(pool, conn)
+    else:
+        pool['idle'].put(conn)
+
+@contextlib.contextmanager
+def connection(pool):
+    """Checks a connection out of the pool for the duration of a with-block."""
+    conn = acquire(pool)
+    try:
+        yield conn
+    finally:
+        release(pool, conn)
+
+def pool_stats(pool):
+    """Returns a snapshot of the pool counters."""
+    with pool['lock']:
+        stats = dict(pool['stats'])
+    stats['size'] = pool['size']
+    stats['idle'] = pool['idle'].qsize()
+    stats['avg_wait_ms'] = stats['wait_seconds'] / stats['checkouts'] * 1000 if stats['checkouts'] else 0.0
+    return stats
+
+def close_pool(pool):
+    """Closes every idle connection."""
+    while True:
+        try:
+            conn = pool['idle'].get_nowait()
+        except queue.Empty:
+            break
+        conn.close()
+        with pool['lock']:
+            pool['opened_on'].pop(conn, None)
+            pool['stats']['connections'] -= 1
+
+# --- Concurrent Queries ---
+# Independent read-only queries are dispatched on a thread pool, each on its
+# own pooled connection; SQLite releases the GIL while a statement runs, so
+# they overlap and a page render waits for the slowest query rather than the
+# sum of all of them. The degree of parallelism is set by QUERY_WORKERS
+# (environment variable of the same name; 1 runs everything inline).
+
+QUERY_WORKERS = int(os.environ.get('QUERY_WORKERS', 4))
+
+def create_executor(workers=QUERY_WORKERS):
+    """Creates the thread pool used by gather(), or None to run inline."""
+    if workers <= 1:
+        return None
+    return concurrent.futures.ThreadPoolExecutor(max_workers=workers, thread_name_prefix='query')
+
+def gather(executor, calls):
+    """Runs {name: zero-argument callable} concurrently and returns {name: result}."""
+    if executor is None or len(calls) <= 1:
+        return {name: call() for name, call in calls.items()}
+    futures = {name: executor.submit(call) for name, call in calls.items()}
+    return {name: future.result() for name, future in futures.items()}
+
+def fetch_concurrently(pool, executor, jobs):
+    """Runs {name: function(conn)} concurrently, each job on its own pooled connection."""
+    def run(job):
+        with connection(pool) as conn:
+            return job(conn)
+    return gather(executor, {name: (lambda job=job: run(job)) for name, job in jobs.items()})
@@ -2,7 +2,14 @@
 
 import pandas as pd
 import numpy as np
+import argparse
+import collections
 import datetime
+import itertools
+import json
+import multiprocessing
+import os
+import shutil
 
 # --- Simulation Parameters (from GEMINI.md) ---
 
@@ -74,147 +81,629 @@ DAY_OF_WEEK_OCCUPANCY = {
 NO_SHOW_RATE = 0.15
 ADHOC_BOOKING_RATE = 0.20 # 20% of bookings are ad-hoc walk-ins
 
+# Departmental Activity: in-office attendance relative to the day-of-week
+# occupancy (Operations and Global Markets come in more, IT is more flexible).
+DEPARTMENT_ATTENDANCE = {
+    'Global Markets': 1.15,
+    'Wealth & Personal Banking': 1.00,
+    'Operations': 1.20,
+    'IT': 0.80,
+    'Human Resources': 0.95,
+    'Corporate Services': 0.90
+}
+# Individual habits: each employee's propensity to come in is drawn once from
+# a gamma distribution with mean 1 (a larger shape means less spread).
+ATTENDANCE_SHAPE = 6.0
+
 # --- Helper Functions ---
 
-def create_employee_data(n_employees, departments):
+def create_employee_data(n_employees, departments, rng=None):
     """Creates a DataFrame of employees with their assigned department."""
-    employee_ids = range(1, n_employees + 1)
-    employee_deps = np.random.choice(
-        list(departments.keys()),
-        size=n_employees,
-        p=list(departments.values())
-    )
-    return pd.DataFrame({'Employee_ID': employee_ids, 'Department': employee_deps})
+    rng = rng or np.random.default_rng()
+    employee_ids = np.arange(1, n_employees + 1, dtype=np.int32)
+    employee_deps = rng.choice(len(departments), size=n_employees, p=list(departments.values()))
+    return pd.DataFrame({
+        'Employee_ID': employee_ids,
+        'Department': pd.Categorical.from_codes(employee_deps.astype(np.int8), list(departments)),
+    })
+
+def scale_locations(locations, building_scale):
+    """
+    Returns a copy of `locations` with every building repeated `building_scale`
+    times (copies are suffixed ' #2', ' #3', ...), e.g. to benchmark larger
+    estates. A scale of 1 returns the locations unchanged.
+    """
+    if building_scale == 1:
+        return locations
+    scaled = {}
+    for country, country_data in locations.items():
+        scaled[country] = dict(
+            country_data,
+            cities={
+                city: [b if k == 0 else f"{b} #{k + 1}" for k in range(building_scale) for b in buildings]
+                for city, buildings in country_data['cities'].items()
+            },
+            capacity_per_building=list(country_data['capacity_per_building']) * building_scale,
+        )
+    return scaled
 
-def create_space_inventory():
-    """Creates a DataFrame representing all available spaces across all locations."""
-    spaces = []
-    space_id_counter = 1
-    for country, country_data in LOCATIONS.items():
+INVENTORY_COLUMNS = ['Space_ID', 'Region', 'Country', 'City', 'Building', 'Floor', 'Space_Type', 'Capacity']
+
+def create_space_inventory(rng=None, locations=LOCATIONS):
+    """
+    Creates a DataFrame representing all available spaces across all locations.
+
+    The loops only run per building and space type; the spaces of each such
+    block are expanded with np.repeat, so the text columns are categorical
+    codes and the cost per space is a few bytes rather than a dict.
+    """
+    rng = rng or np.random.default_rng()
+    blocks = []
+    for country, country_data in locations.items():
         for city, buildings in country_data['cities'].items():
             for i, building in enumerate(buildings):
                 capacity = country_data['capacity_per_building'][i]
                 for space_type, type_data in SPACE_TYPES.items():
                     num_spaces = int(capacity * type_data['booking_prob'] / type_data['capacity'])
-                    for _ in range(num_spaces):
-                        spaces.append({
-                            'Space_ID': space_id_counter,
-                            'Region': 'ASP',
-                            'Country': country,
-                            'City': city,
-                            'Building': building,
-                            'Floor': np.random.randint(5, 25),
-                            'Space_Type': space_type,
-                            'Capacity': type_data['capacity']
-                        })
-                        space_id_counter += 1
-    return pd.DataFrame(spaces)
+                    blocks.append((country, city, building, space_type, type_data['capacity'], num_spaces))
+    blocks = pd.DataFrame(blocks, columns=['Country', 'City', 'Building', 'Space_Type', 'Capacity', 'Spaces'])
+    rows = np.repeat(np.arange(len(blocks)), blocks['Spaces'].to_numpy())
+    n_spaces = len(rows)
+
+    spaces = {
+        'Space_ID': np.arange(1, n_spaces + 1, dtype=np.int32),
+        'Region': pd.Categorical.from_codes(np.zeros(n_spaces, dtype=np.int8), ['ASP']),
+    }
+    for col in ['Country', 'City', 'Building', 'Space_Type']:
+        # Categories in inventory order, so codes follow the Space_ID order.
+        codes, categories = pd.factorize(blocks[col])
+        spaces[col] = pd.Categorical.from_codes(codes[rows], categories)
+    spaces['Floor'] = rng.integers(5, 25, size=n_spaces).astype(np.int16)
+    spaces['Capacity'] = blocks['Capacity'].to_numpy(dtype=np.int16)[rows]
+    return pd.DataFrame(spaces, columns=INVENTORY_COLUMNS)
+
+# --- Vectorised Day Engine ---
+# The day simulator works on plain NumPy arrays instead of per-employee
+# DataFrame rows. Everything that does not change between days (department
+# codes, home buildings, attendance propensities, the per-building space
+# samplers, the space attribute columns) is precomputed once by
+# build_day_engine().
+
+DEPARTMENT_NAMES = list(DEPARTMENTS.keys())
+SPACE_COLUMNS = ['Region', 'Country', 'City', 'Building', 'Space_Type']
+ACTIVITY_TYPES = ['Desk Booking', 'Check-in']
+BOOKING_STATUSES = ['Confirmed', 'No-Show']
+OUTPUT_COLUMNS = [
+    'Date', 'Time', 'Employee_ID', 'Department', 'Activity_Type', 'Space_ID',
+    'Booking_Status', 'Region', 'Country', 'City', 'Building', 'Floor', 'Space_Type'
+]
+
+# Bookings happen between 08:00 and 17:00 (09:00 -1h/+8h).
+BOOKING_WINDOW_START = 8 * 3600
+BOOKING_WINDOW_SECONDS = 9 * 3600
+
+# Booking times are kept as integer seconds of the day; this table holds the
+# 'HH:MM:SS' label for every second so formatting them for CSV is a lookup.
+TIME_LABELS = np.array(
+    [f"{s // 3600:02d}:{s // 60 % 60:02d}:{s % 60:02d}" for s in range(24 * 3600)],
+    dtype=object
+)
+
+# --- Weighted Sampling ---
+# Spaces are drawn with Walker's alias method: a table built once per building
+# turns every capacity-weighted draw into one uniform slot pick plus one coin
+# flip, O(1) per booking however many spaces the building has. The tables of
+# all buildings are concatenated into two flat arrays (spaces ordered by
+# building), so a day's draws for every building are a few array operations.
+
+def build_alias_table(weights):
+    """
+    Builds the alias table (Vose's method) for sampling index i with
+    probability weights[i] / sum(weights). Returns (prob, alias): slot i keeps
+    i with probability prob[i] and yields alias[i] otherwise.
+    """
+    n = len(weights)
+    scaled = (np.asarray(weights, dtype=np.float64) * n / np.sum(weights)).tolist()
+    prob = [1.0] * n
+    alias = list(range(n))
+    small = [i for i, w in enumerate(scaled) if w < 1.0]
+    large = [i for i, w in enumerate(scaled) if w >= 1.0]
+    while small and large:
+        lo, hi = small.pop(), large[-1]
+        prob[lo] = scaled[lo]
+        alias[lo] = hi
+        scaled[hi] -= 1.0 - scaled[lo]
+        if scaled[hi] < 1.0:
+            small.append(large.pop())
+    # Slots left over are full (prob 1) up to rounding.
+    return np.array(prob), np.array(alias, dtype=np.int64)
+
+def build_space_samplers(building_codes, capacities):
+    """
+    Per-building alias tables over spaces sorted by building. Returns the
+    flat prob/alias arrays (alias entries are indexes into the sorted spaces)
+    and each building's offset and size.
+    """
+    sizes = np.bincount(building_codes)
+    offsets = np.concatenate([[0], np.cumsum(sizes)[:-1]])
+    prob = np.ones(len(capacities))
+    alias = np.arange(len(capacities))
+    for offset, size in zip(offsets, sizes):
+        if size:
+            prob[offset:offset + size], alias[offset:offset + size] = build_alias_table(capacities[offset:offset + size])
+            alias[offset:offset + size] += offset
+    return {
+        'alias_prob': prob.astype(np.float32),
+        'alias_index': alias.astype(np.int32),
+        'building_offsets': offsets.astype(np.int64),
+        'building_sizes': sizes.astype(np.int64),
+    }
+
+# --- Home Buildings & Attendance ---
+# Every employee has a home building, drawn once in proportion to the seats
+# each building has, and books there whenever they come in. How often they
+# come in is a fixed per-employee propensity: their department's attendance
+# factor, their home country's occupancy_variation and an individual habit
+# (ATTENDANCE_SHAPE). On a given day an employee is present with probability
+# day-of-week occupancy x propensity.
+#
+# Both are stored as compact arrays (the building as a categorical code, the
+# propensity as float16), a few bytes per employee.
+
+def assign_home_buildings(employees_df, spaces_df, rng=None, locations=LOCATIONS):
+    """Adds the Home_Building and Attendance columns to the employee DataFrame."""
+    rng = rng or np.random.default_rng()
+    buildings = spaces_df.groupby('Building', sort=False, observed=True).agg(
+        Country=('Country', 'first'), Seats=('Capacity', 'sum'))
+    seats = buildings['Seats'].to_numpy(dtype=np.float64)
+    homes = rng.choice(len(buildings), size=len(employees_df), p=seats / seats.sum())
+
+    department_factor = np.array([DEPARTMENT_ATTENDANCE[d] for d in DEPARTMENT_NAMES])
+    country_factor = np.array([1 + locations[c]['occupancy_variation'] for c in buildings['Country']])
+    department_codes = pd.Categorical(employees_df['Department'], categories=DEPARTMENT_NAMES).codes
+    habit = rng.gamma(ATTENDANCE_SHAPE, 1 / ATTENDANCE_SHAPE, size=len(employees_df))
+    attendance = department_factor[department_codes] * country_factor[homes] * habit
+    return employees_df.assign(
+        Home_Building=pd.Categorical.from_codes(homes, buildings.index.astype(str)),
+        Attendance=attendance.astype(np.float16),
+    )
+
+# --- Scenario Parameters ---
+# The behavioural rates simulate_day() uses, as one flat dict so a scenario
+# sweep can override any of them. The defaults are the constants above.
+WEEKDAY_KEYS = ['mon', 'tue', 'wed', 'thu', 'fri']
+DEFAULT_PARAMS = {
+    'no_show_rate': NO_SHOW_RATE,
+    'adhoc_rate': ADHOC_BOOKING_RATE,
+    **{f"{day}_occupancy": DAY_OF_WEEK_OCCUPANCY[i] for i, day in enumerate(WEEKDAY_KEYS)},
+}
+
+def simulation_params(overrides=None):
+    """Returns DEFAULT_PARAMS with `overrides` applied."""
+    unknown = set(overrides or {}) - set(DEFAULT_PARAMS)
+    if unknown:
+        raise ValueError(f"Unknown simulation parameter(s): {', '.join(sorted(unknown))}. "
+                         f"Valid: {', '.join(DEFAULT_PARAMS)}")
+    return dict(DEFAULT_PARAMS, **(overrides or {}))
+
+EMPLOYEE_ARRAYS = ['employee_ids', 'department_codes', 'home_buildings', 'attendance']
+
+def build_day_engine(employees_df, spaces_df, params=None):
+    """
+    Precomputes the array lookups used by simulate_day(). `params` overrides
+    the DEFAULT_PARAMS rates.
+
+    Spaces are ordered by building, the order of the per-building alias
+    tables (see build_space_samplers()). Employees are located by their
+    Home_Building code in that same order.
+    """
+    building_codes, building_names = pd.factorize(spaces_df['Building'])
+    order = np.argsort(building_codes, kind='stable')
+    capacities = spaces_df['Capacity'].to_numpy(dtype=np.float64)[order]
+    space_categoricals = {col: pd.Categorical(spaces_df[col].to_numpy()[order]) for col in SPACE_COLUMNS}
+
+    return {
+        'employee_ids': employees_df['Employee_ID'].to_numpy(dtype=np.int32),
+        'department_codes': pd.Categorical(employees_df['Department'], categories=DEPARTMENT_NAMES).codes,
+        'home_buildings': pd.Categorical(employees_df['Home_Building'], categories=building_names).codes,
+        'attendance': employees_df['Attendance'].to_numpy(dtype=np.float16),
+        **build_space_samplers(building_codes[order], capacities),
+        'space_ids': spaces_df['Space_ID'].to_numpy(dtype=np.int32)[order],
+        'space_floors': spaces_df['Floor'].to_numpy(dtype=np.int16)[order],
+        'space_codes': {col: cat.codes for col, cat in space_categoricals.items()},
+        'space_categories': {col: cat.categories for col, cat in space_categoricals.items()},
+        'params': simulation_params(params),
+    }
+
+def engine_footprint(engine):
+    """Bytes the engine holds per employee and per space."""
+    n_employees = len(engine['employee_ids'])
+    n_spaces = len(engine['space_ids'])
+    employee_bytes = sum(engine[key].nbytes for key in EMPLOYEE_ARRAYS)
+    space_bytes = sum(engine[key].nbytes for key in ['alias_prob', 'alias_index', 'space_ids', 'space_floors'])
+    space_bytes += sum(codes.nbytes for codes in engine['space_codes'].values())
+    return {
+        'bytes_per_employee': employee_bytes / n_employees if n_employees else 0.0,
+        'bytes_per_space': space_bytes / n_spaces if n_spaces else 0.0,
+        'total_bytes': employee_bytes + space_bytes,
+    }
+
+def draw_spaces(engine, buildings, rng):
+    """Draws one space index per entry of `buildings`, weighted by capacity (alias method)."""
+    sizes = engine['building_sizes'][buildings]
+    slots = (rng.random(len(buildings)) * sizes).astype(np.int64)
+    # Guard against float round-up landing one past the building's last slot.
+    slots = engine['building_offsets'][buildings] + np.minimum(slots, sizes - 1)
+    keep = rng.random(len(buildings)) < engine['alias_prob'][slots]
+    return np.where(keep, slots, engine['alias_index'][slots])
+
+def draw_day(current_date, engine, rng):
+    """
+    Draws every booking for a single day as parallel arrays (indexes into the
+    engine's employees and spaces), or None if nobody comes in.
+
+    Each employee comes in with the day-of-week occupancy times their
+    attendance propensity and books a space in their home building (see
+    "Home Buildings & Attendance"); bookings are ad-hoc with the ad-hoc rate,
+    pre-bookings no-show with the no-show rate and the booking time is uniform
+    between 08:00 and 17:00. The rates come from engine['params'].
+    """
+    day_of_week = current_date.dayofweek
+    if day_of_week > 4: # Skip weekends
+        return None
+
+    params = engine['params']
+    base_occupancy = np.float32(params[f"{WEEKDAY_KEYS[day_of_week]}_occupancy"])
+    present = np.flatnonzero(rng.random(len(engine['employee_ids']), dtype=np.float32) <
+                             engine['attendance'] * base_occupancy)
+    if len(present) == 0:
+        return None
+
+    department_codes = engine['department_codes'][present]
+    n_bookings = len(present)
+
+    is_adhoc = rng.random(n_bookings) < params['adhoc_rate']
+    spaces = draw_spaces(engine, engine['home_buildings'][present], rng)
+    no_show = ~is_adhoc & (rng.random(n_bookings) < params['no_show_rate'])
+    seconds = BOOKING_WINDOW_START + (rng.random(n_bookings) * BOOKING_WINDOW_SECONDS).astype(np.int32)
+    return {
+        'present': present,
+        'department_codes': department_codes,
+        'spaces': spaces,
+        'is_adhoc': is_adhoc,
+        'no_show': no_show,
+        'seconds': seconds,
+    }
+
+def simulate_day(current_date, engine, rng):
+    """
+    Simulates every booking for a single day (see draw_day()) and returns them
+    as a DataFrame with compact dtypes: categorical dimensions, int32 IDs and
+    `Time` as integer seconds of the day.
+    """
+    drawn = draw_day(current_date, engine, rng)
+    if drawn is None:
+        return None
+    present, spaces = drawn['present'], drawn['spaces']
+    n_bookings = len(present)
+
+    day = {
+        'Date': pd.Categorical.from_codes(np.zeros(n_bookings, dtype=np.int8), [current_date.strftime('%Y-%m-%d')]),
+        'Time': drawn['seconds'],
+        'Employee_ID': engine['employee_ids'][present],
+        'Department': pd.Categorical.from_codes(drawn['department_codes'], DEPARTMENT_NAMES),
+        'Activity_Type': pd.Categorical.from_codes(drawn['is_adhoc'].astype(np.int8), ACTIVITY_TYPES),
+        'Space_ID': engine['space_ids'][spaces],
+        'Booking_Status': pd.Categorical.from_codes(drawn['no_show'].astype(np.int8), BOOKING_STATUSES),
+        'Floor': engine['space_floors'][spaces],
+    }
+    for col in SPACE_COLUMNS:
+        day[col] = pd.Categorical.from_codes(engine['space_codes'][col][spaces], engine['space_categories'][col])
+    return pd.DataFrame(day, columns=OUTPUT_COLUMNS)
+
+# --- Seeding & Parallel Execution ---
+# Every simulated day draws from its own generator seeded with
+# (master_seed, date ordinal), and the inventories draw from one seeded with
+# the master seed alone. A day's output therefore depends only on the master
+# seed and its date, never on which worker simulated it or in what order.
+
+DAYS_PER_TASK = 7
+
+def day_rng(master_seed, current_date):
+    """Returns the random generator for one simulated day."""
+    return np.random.default_rng([master_seed, current_date.toordinal()])
+
+def build_inventories(master_seed, n_employees=TOTAL_EMPLOYEES, building_scale=1):
+    """Creates the employee and space inventories for a master seed."""
+    rng = np.random.default_rng(master_seed)
+    locations = scale_locations(LOCATIONS, building_scale)
+    employees_df = create_employee_data(n_employees, DEPARTMENTS, rng)
+    spaces_df = create_space_inventory(rng, locations)
+    employees_df = assign_home_buildings(employees_df, spaces_df, rng, locations)
+    return employees_df, spaces_df
+
+def simulate_days(dates, engine, master_seed):
+    """Simulates a block of days and returns their bookings as one DataFrame."""
+    frames = [simulate_day(d, engine, day_rng(master_seed, d)) for d in dates]
+    frames = [f for f in frames if f is not None]
+    if not frames:
+        return None
+    block = pd.concat(frames, ignore_index=True)
+    # Each day carries its own one-value Date category; re-encode the block.
+    block['Date'] = pd.Categorical(block['Date'].astype(str))
+    return block
+
+# Set once per worker process by _init_worker so the (read-only) engine arrays
+# are shipped to each worker a single time rather than with every task. With
+# the default 'fork' start method on Linux they are not copied at all.
+_worker_state = {}
+
+def _init_worker(engine, master_seed, dates=None):
+    _worker_state['engine'] = engine
+    _worker_state['master_seed'] = master_seed
+    _worker_state['dates'] = dates
+
+def _simulate_days_task(dates):
+    return simulate_days(dates, _worker_state['engine'], _worker_state['master_seed'])
+
+def iter_day_blocks(date_range, engine, master_seed, workers=1):
+    """
+    Yields simulated bookings one block of DAYS_PER_TASK days at a time, in
+    date order. With workers > 1 the blocks are simulated on a process pool;
+    at most 2 * workers blocks are in flight so memory stays bounded even if
+    the consumer (the writer) is slower than the simulation.
+    """
+    blocks = [date_range[i:i + DAYS_PER_TASK] for i in range(0, len(date_range), DAYS_PER_TASK)]
+    if workers <= 1:
+        for dates in blocks:
+            yield simulate_days(dates, engine, master_seed)
+        return
+
+    with multiprocessing.Pool(workers, initializer=_init_worker, initargs=(engine, master_seed)) as pool:
+        pending = collections.deque()
+        for dates in blocks:
+            pending.append(pool.apply_async(_simulate_days_task, (dates,)))
+            if len(pending) >= 2 * workers:
+                yield pending.popleft().get()
+        while pending:
+            yield pending.popleft().get()
+
+# --- Streaming Output ---
+# Blocks are written as soon as they are simulated, so peak memory is one
+# block (a week of bookings) per worker no matter how long the timeframe is.
+
+OUTPUT_FORMATS = {'csv': 'raw_workspace_data.csv', 'parquet': 'raw_workspace_data.parquet'}
+PARQUET_PARTITION_COLS = ['Date', 'Country']
+
+def prepare_output(output_path, output_format):
+    """Removes the output of a previous run."""
+    if output_format == 'parquet' and os.path.isdir(output_path):
+        shutil.rmtree(output_path)
+    elif os.path.exists(output_path):
+        os.remove(output_path)
+
+def write_block(block, output_path, output_format, block_number):
+    """
+    Appends one block of bookings to the output.
+
+    CSV keeps the original layout (Time as 'HH:MM:SS'). Parquet is written as
+    a dataset partitioned by Date/Country with the compact dtypes intact
+    (dictionary-encoded dimensions, int32 IDs, Time as integer seconds).
+    """
+    if output_format == 'csv':
+        csv_block = block.assign(Time=TIME_LABELS[block['Time'].to_numpy()])
+        csv_block.to_csv(output_path, mode='a', header=block_number == 0, index=False)
+    else:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        table = pa.Table.from_pandas(block, preserve_index=False)
+        pq.write_to_dataset(
+            table, output_path, partition_cols=PARQUET_PARTITION_COLS,
+            basename_template=f"block-{block_number:05d}-{{i}}.parquet",
+            existing_data_behavior='overwrite_or_ignore'
+        )
 
 # --- Main Simulation Logic ---
 
-def generate_raw_data():
+def generate_raw_data(seed=None, workers=1, days=None, output_format='csv', output_path=None,
+                      n_employees=TOTAL_EMPLOYEES, first_date=start_date, last_date=end_date, building_scale=1):
     """
-    Generates a realistic raw_workspace_data.csv file based on the defined
-    simulation parameters.
+    Generates a realistic raw_workspace_data.csv file (or a Parquet dataset)
+    based on the defined simulation parameters.
 
     This script simulates daily workspace bookings and check-ins over a specified
     period, incorporating hybrid work patterns, regional variations, and
-    departmental behaviors.
+    departmental behaviors. Each day is simulated in one vectorised pass by
+    simulate_day(); with `workers` > 1 the days are sharded across a process
+    pool. The output is identical for a given `seed` whatever the worker count.
+    Passing `days` restricts the run to those dates (e.g. to reproduce a
+    single day while debugging). `n_employees`, `first_date`/`last_date` and
+    `building_scale` size the simulation (see benchmark.py); the defaults are
+    the parameters above.
     """
+    if seed is None:
+        seed = np.random.SeedSequence().entropy
+    output_path = output_path or OUTPUT_FORMATS[output_format]
     print("Starting data generation...")
+    print(f"   - Master seed: {seed}")
     print("1. Creating employee and space inventories...")
-    employees_df = create_employee_data(TOTAL_EMPLOYEES, DEPARTMENTS)
-    spaces_df = create_space_inventory()
+    employees_df, spaces_df = build_inventories(seed, n_employees, building_scale)
+    engine = build_day_engine(employees_df, spaces_df)
+    print(f"   - {len(employees_df):,} employees, {len(spaces_df):,} spaces in {spaces_df['Building'].nunique()} buildings")
+    footprint = engine_footprint(engine)
+    print(f"   - Day engine: {footprint['bytes_per_employee']:.0f} bytes per employee, "
+          f"{footprint['bytes_per_space']:.0f} bytes per space ({footprint['total_bytes'] / 2**20:.1f} MiB)")
 
-    all_bookings = []
-    date_range = pd.to_datetime(pd.date_range(start=start_date, end=end_date))
+    date_range = pd.to_datetime(pd.date_range(start=first_date, end=last_date))
+    if days is not None:
+        date_range = pd.to_datetime(pd.DatetimeIndex(days))
 
-    print(f"2. Simulating bookings for {len(date_range)} days...")
-    for current_date in date_range:
-        day_of_week = current_date.dayofweek
-        if day_of_week > 4: # Skip weekends
+    print(f"2. Simulating {len(date_range)} days on {workers} worker(s), streaming to '{output_path}'...")
+    prepare_output(output_path, output_format)
+    total_records = 0
+    block_number = 0
+    for block in iter_day_blocks(date_range, engine, seed, workers):
+        if block is None:
             continue
+        write_block(block, output_path, output_format, block_number)
+        total_records += len(block)
+        block_number += 1
 
-        # Determine number of employees in office today
-        base_occupancy = DAY_OF_WEEK_OCCUPANCY[day_of_week]
-        
-        # Each employee decides to come in based on the day's probability
-        # Adding some randomness per employee
-        u = np.random.rand(TOTAL_EMPLOYEES)
-        employees_present_today = employees_df[u < base_occupancy]
-        
-        if employees_present_today.empty:
-            continue
+    print(f"\nSuccessfully generated '{output_path}' with {total_records} records.")
+    print("Data generation complete.")
 
-        # Assign employees to buildings for the day
-        # For simplicity, randomly assign to a building within a country
-        # A more complex model could have home locations
-        present_employees_with_loc = []
-        for dep in employees_present_today['Department'].unique():
-            dep_employees = employees_present_today[employees_present_today['Department'] == dep]
-            # Assign all employees from a department to the same country for the day to simulate team days
-            country = np.random.choice(list(LOCATIONS.keys()))
-            for emp_id in dep_employees['Employee_ID']:
-                 present_employees_with_loc.append({'Employee_ID': emp_id, 'Department': dep, 'Country': country})
-        
-        if not present_employees_with_loc:
+# --- Scenario Sweeps ---
+# A sweep answers "what if" questions by simulating the same period once per
+# combination of parameter values, e.g. a grid of
+# {"no_show_rate": [0.08, 0.15], "tue_occupancy": [0.62, 0.75]}. The
+# inventories and the day engine are built once; a scenario only swaps the
+# engine's params. Each scenario is reduced to the dashboard's region-level
+# KPIs while it is simulated instead of writing raw bookings, so memory stays
+# at one day of bookings per worker however many scenarios there are.
+#
+# Every scenario uses the same master seed, so differences between scenarios
+# come from the parameters rather than from sampling noise, and the default
+# parameters reproduce the KPIs of generate_raw_data() with that seed.
+
+SWEEP_FILE = 'scenario_kpis.csv'
+
+def load_grid(spec):
+    """Parses a parameter grid given as inline JSON or as the path of a JSON file."""
+    if os.path.exists(spec):
+        with open(spec) as f:
+            return json.load(f)
+    return json.loads(spec)
+
+def expand_grid(grid):
+    """Returns one parameter-override dict per combination of the grid's values."""
+    simulation_params(grid)  # Rejects unknown parameter names
+    values = [v if isinstance(v, list) else [v] for v in grid.values()]
+    return [dict(zip(grid, combination)) for combination in itertools.product(*values)]
+
+def scenario_kpis(dates, engine, master_seed):
+    """
+    Simulates one scenario and returns its KPIs, with the definitions used by
+    the dashboard (kpi_engine.summarize_kpis) over the whole region and
+    the column names of kpi_report.py. Every present employee makes one
+    booking a day, so a day's distinct users are its confirmed bookings.
+    Total_Spaces is the whole inventory, including spaces nobody booked.
+    """
+    seen = np.zeros(len(engine['employee_ids']), dtype=bool)
+    bookings = no_shows = check_ins = 0
+    daily_users = []
+    weekday_users = {day: [] for day in WEEKDAY_KEYS}
+    for current_date in dates:
+        drawn = draw_day(current_date, engine, day_rng(master_seed, current_date))
+        if drawn is None:
             continue
-            
-        daily_employees_df = pd.DataFrame(present_employees_with_loc)
-        
-        # Simulate bookings for these present employees
-        for _, employee in daily_employees_df.iterrows():
-            # Decide booking type: ad-hoc or pre-booked
-            is_adhoc = np.random.rand() < ADHOC_BOOKING_RATE
-            
-            # Choose a space in their assigned country
-            possible_spaces = spaces_df[spaces_df['Country'] == employee['Country']]
-            if possible_spaces.empty:
-                continue
-
-            chosen_space = possible_spaces.sample(1, weights=possible_spaces['Capacity']).iloc[0]
-
-            # Determine booking status
-            if not is_adhoc and np.random.rand() < NO_SHOW_RATE:
-                status = 'No-Show'
-            else:
-                status = 'Confirmed'
-
-            booking_time = (datetime.datetime.combine(current_date, datetime.time(9, 0)) + 
-                            datetime.timedelta(hours=np.random.uniform(-1, 8))).time()
-
-            all_bookings.append({
-                'Date': current_date.date(),
-                'Time': booking_time,
-                'Employee_ID': employee['Employee_ID'],
-                'Department': employee['Department'],
-                'Activity_Type': 'Check-in' if is_adhoc else 'Desk Booking',
-                'Space_ID': chosen_space['Space_ID'],
-                'Booking_Status': status,
-                'Region': chosen_space['Region'],
-                'Country': chosen_space['Country'],
-                'City': chosen_space['City'],
-                'Building': chosen_space['Building'],
-                'Floor': chosen_space['Floor'],
-                'Space_Type': chosen_space['Space_Type']
-            })
-
-    print("3. Finalizing DataFrame and saving to CSV...")
-    final_df = pd.DataFrame(all_bookings)
-    
-    # Ensure correct data types
-    for col in ['Employee_ID', 'Space_ID', 'Floor']:
-        final_df[col] = pd.to_numeric(final_df[col])
-
-    final_df['Date'] = pd.to_datetime(final_df['Date'])
-
-    # Save the file
-    output_filename = 'raw_workspace_data.csv'
-    final_df.to_csv(output_filename, index=False)
-    print(f"\nSuccessfully generated '{output_filename}' with {len(final_df)} records.")
-    print("Data generation complete.")
+        confirmed = ~drawn['no_show']
+        users = int(confirmed.sum())
+        bookings += len(confirmed)
+        no_shows += int(drawn['no_show'].sum())
+        check_ins += int((drawn['is_adhoc'] & confirmed).sum())
+        if users:
+            seen[drawn['present'][confirmed]] = True
+            daily_users.append(users)
+            weekday_users[WEEKDAY_KEYS[current_date.dayofweek]].append(users)
 
+    total_spaces = len(engine['space_ids'])
+    avg_daily_users = float(np.mean(daily_users)) if daily_users else 0.0
+    kpis = {
+        'Bookings': bookings,
+        'Peak_Occupancy': int(seen.sum()),
+        'Peak_Daily_Users': max(daily_users, default=0),
+        'Avg_Daily_Users': avg_daily_users,
+        'Total_Spaces': total_spaces,
+        'Avg_Utilization_Pct': avg_daily_users / total_spaces * 100 if total_spaces else 0.0,
+        'No_Show_Rate_Pct': no_shows / bookings * 100 if bookings else 0.0,
+        'Adhoc_Rate_Pct': check_ins / (bookings - no_shows) * 100 if bookings > no_shows else 0.0,
+    }
+    for day, users in weekday_users.items():
+        kpis[f"Avg_Users_{day.capitalize()}"] = float(np.mean(users)) if users else 0.0
+    return kpis
 
-if __name__ == '__main__':
-    generate_raw_data()
+def _scenario_task(overrides):
+    params = simulation_params(overrides)
+    engine = dict(_worker_state['engine'], params=params)
+    return dict(params, **scenario_kpis(_worker_state['dates'], engine, _worker_state['master_seed']))
 
+def run_sweep(grid, seed=None, workers=1, output_path=None, n_employees=TOTAL_EMPLOYEES,
+              first_date=start_date, last_date=end_date, building_scale=1):
+    """
+    Simulates every scenario of a parameter grid (see expand_grid()) on
+    `workers` processes and writes one row of KPIs per scenario to a CSV (or
+    Parquet, by file extension). Returns the KPI table.
+    """
+    if seed is None:
+        seed = np.random.SeedSequence().entropy
+    output_path = output_path or SWEEP_FILE
+    scenarios = expand_grid(grid)
+    print("Starting scenario sweep...")
+    print(f"   - Master seed: {seed}")
+    print("1. Creating employee and space inventories...")
+    employees_df, spaces_df = build_inventories(seed, n_employees, building_scale)
+    engine = build_day_engine(employees_df, spaces_df)
+    dates = pd.to_datetime(pd.date_range(start=first_date, end=last_date))
+
+    print(f"2. Simulating {len(scenarios)} scenario(s) x {len(dates)} days on {workers} worker(s)...")
+    rows = []
+    report_every = max(len(scenarios) // 10, 1)
+    if workers <= 1:
+        _init_worker(engine, seed, dates)
+        results = map(_scenario_task, scenarios)
+        pool = None
+    else:
+        pool = multiprocessing.Pool(workers, initializer=_init_worker, initargs=(engine, seed, dates))
+        results = pool.imap(_scenario_task, scenarios)
+    try:
+        for row in results:
+            rows.append(row)
+            if len(rows) % report_every == 0 or len(rows) == len(scenarios):
+                print(f"   - {len(rows)}/{len(scenarios)} scenarios done")
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+
+    kpis = pd.DataFrame(rows)
+    kpis.insert(0, 'Scenario', range(1, len(kpis) + 1))
+    print(f"3. Writing {len(kpis)} scenario(s) to '{output_path}'...")
+    if output_path.endswith('.parquet'):
+        kpis.to_parquet(output_path, index=False)
+    else:
+        kpis.to_csv(output_path, index=False, float_format='%.4f')
+    print("Scenario sweep complete.")
+    return kpis
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Generate simulated workspace booking data.")
+    parser.add_argument('--workers', type=int, default=1, help="Number of worker processes (default: 1).")
+    parser.add_argument('--seed', type=int, default=None, help="Master seed; the same seed reproduces the same output.")
+    parser.add_argument('--day', action='append', dest='days', metavar='YYYY-MM-DD',
+                        help="Only simulate this date (repeatable), e.g. to reproduce one day.")
+    parser.add_argument('--format', choices=sorted(OUTPUT_FORMATS), default='csv', dest='output_format',
+                        help="Output format: appended CSV or a Date/Country-partitioned Parquet dataset.")
+    parser.add_argument('--output', default=None, help="Output path (default depends on --format).")
+    parser.add_argument('--employees', type=int, default=TOTAL_EMPLOYEES,
+                        help=f"Size of the employee pool (default: {TOTAL_EMPLOYEES}).")
+    parser.add_argument('--start', type=datetime.date.fromisoformat, default=start_date,
+                        help=f"First simulated date (default: {start_date}).")
+    parser.add_argument('--end', type=datetime.date.fromisoformat, default=end_date,
+                        help=f"Last simulated date (default: {end_date}).")
+    parser.add_argument('--building-scale', type=int, default=1,
+                        help="Repeat every building this many times (default: 1).")
+    parser.add_argument('--sweep', metavar='GRID', default=None,
+                        help="Run a scenario sweep instead: a JSON grid (inline or a file path) of parameter "
+                             f"values, e.g. '{{\"no_show_rate\": [0.08, 0.15]}}'. Parameters: {', '.join(DEFAULT_PARAMS)}. "
+                             f"Writes per-scenario KPIs to --output (default: {SWEEP_FILE}).")
+    args = parser.parse_args()
+    if args.sweep:
+        run_sweep(load_grid(args.sweep), seed=args.seed, workers=args.workers, output_path=args.output,
+                  n_employees=args.employees, first_date=args.start, last_date=args.end,
+                  building_scale=args.building_scale)
+        raise SystemExit(0)
+    generate_raw_data(seed=args.seed, workers=args.workers, days=args.days,
+                      output_format=args.output_format, output_path=args.output,
+                      n_employees=args.employees, first_date=args.start, last_date=args.end,
+                      building_scale=args.building_scale)
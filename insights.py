@@ -0,0 +1,218 @@
+
+
+import concurrent.futures
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+import numpy as np
+import pandas as pd
+
+# --- AI Insights ---
+# Insights are generated off the Streamlit script thread and cached on disk:
+#
+# - The cache key is a SHA-256 of the summary serialized as canonical JSON
+#   (sorted keys) plus the model name, so the same dashboard view always maps
+#   to the same file and a different model never reuses another's answer.
+# - Each insight is one JSON file under CACHE_DIR, written atomically. Reads
+#   touch the file, and the least recently used files are evicted once the
+#   directory grows beyond MAX_CACHE_BYTES.
+# - Requests run on a small thread pool. A request for a key that is already
+#   being generated joins the pending one instead of calling the model again.
+#
+# There is one service (worker pool, in-flight table) per model name, shared
+# by every session; the client that calls the model is passed with each
+# request, so sessions with different API keys share the workers and cache.
+# A client is a plain dict ({'name', 'generate'}), so a local stub
+# (stub_client, or INSIGHTS_MODEL=stub) can stand in for Gemini.
+
+CACHE_DIR = os.environ.get('INSIGHTS_CACHE_DIR', '.insights_cache')
+MAX_CACHE_BYTES = 16 * 1024 * 1024
+INSIGHT_WORKERS = 2
+DEFAULT_MODEL = 'gemini-pro'
+
+def convert_to_json_serializable(obj):
+    """Recursively convert non-serializable data types to serializable ones."""
+    if isinstance(obj, dict):
+        return {k: convert_to_json_serializable(v) for k, v in obj.items()}
+    elif isinstance(obj, list):
+        return [convert_to_json_serializable(i) for i in obj]
+    elif isinstance(obj, (np.integer, np.int64)):
+        return int(obj)
+    elif isinstance(obj, (np.floating, np.float64)):
+        return float(obj)
+    elif isinstance(obj, np.ndarray):
+        return obj.tolist()
+    elif pd.isna(obj):
+        return None
+    return obj
+
+def build_prompt(data_summary):
+    """The analyst prompt for a dashboard summary."""
+    serializable_summary = convert_to_json_serializable(data_summary)
+    return f"""
+    You are a senior Workspace Analytics consultant for HSBC. Your task is to provide data-driven insights based on a JSON summary from the Workplace Analytics Dashboard.
+
+    **Dashboard Data Summary:**
+    {json.dumps(serializable_summary, indent=2)}
+
+    **Your Task:**
+    Identify the 2-3 most critical and actionable insights from this data. For each insight, provide a specific data point that backs it up and a concrete recommendation.
+
+    **Output Format (Use Markdown):**
+    **Insight 1:** [A clear, one-sentence insight about a key trend or anomaly.]
+    *   **Data Point:** [The specific metric from the data that supports your insight.]
+    *   **Recommendation:** [A concrete, actionable suggestion.]
+    """
+
+def summary_key(data_summary, model_name):
+    """Stable cache key for a summary and a model."""
+    canonical = json.dumps(convert_to_json_serializable(data_summary), sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(f"{model_name}\n{canonical}".encode('utf-8')).hexdigest()
+
+# --- Model Clients ---
+def gemini_client(api_key, model_name=DEFAULT_MODEL):
+    """A Gemini client; the SDK is imported and configured on the first request."""
+    state = {}
+    def generate(prompt):
+        if 'model' not in state:
+            import google.generativeai as genai
+            genai.configure(api_key=api_key)
+            state['model'] = genai.GenerativeModel(model_name)
+        return state['model'].generate_content(prompt).text
+    return {'name': model_name, 'generate': generate}
+
+def stub_client(name='stub', delay=0.0):
+    """A local stand-in model that answers instantly (after `delay` seconds) without any network call."""
+    def generate(prompt):
+        time.sleep(delay)
+        digest = hashlib.sha256(prompt.encode('utf-8')).hexdigest()[:12]
+        return (f"**Insight 1:** Stub analysis of summary {digest}.\n"
+                f"*   **Data Point:** The prompt was {len(prompt):,} characters long.\n"
+                "*   **Recommendation:** Configure a real model for actual insights.")
+    return {'name': name, 'generate': generate}
+
+# --- Disk Cache ---
+def cache_path(cache_dir, key):
+    return os.path.join(cache_dir, f"{key}.json")
+
+def read_cached(cache_dir, key):
+    """Returns the cached insight text for key, or None."""
+    path = cache_path(cache_dir, key)
+    try:
+        with open(path) as f:
+            entry = json.load(f)
+        os.utime(path)  # Mark as recently used for eviction
+    except (OSError, ValueError):
+        return None
+    return entry['text']
+
+def write_cached(cache_dir, key, model_name, text):
+    """Writes one insight atomically (temporary file + rename)."""
+    os.makedirs(cache_dir, exist_ok=True)
+    entry = {'model': model_name, 'created': time.time(), 'text': text}
+    fd, tmp_path = tempfile.mkstemp(dir=cache_dir, suffix='.tmp')
+    with os.fdopen(fd, 'w') as f:
+        json.dump(entry, f)
+    os.replace(tmp_path, cache_path(cache_dir, key))
+
+def evict(cache_dir, max_bytes):
+    """Removes the least recently used insights until the cache fits in max_bytes; returns how many."""
+    try:
+        files = [entry for entry in os.scandir(cache_dir) if entry.name.endswith('.json')]
+    except OSError:
+        return 0
+    stats = sorted(((f.stat().st_mtime, f.stat().st_size, f.path) for f in files))
+    total = sum(size for _, size, _ in stats)
+    evicted = 0
+    for _, size, path in stats:
+        if total <= max_bytes:
+            break
+        try:
+            os.remove(path)
+        except OSError:
+            continue
+        total -= size
+        evicted += 1
+    return evicted
+
+# --- Background Generation ---
+def create_insight_service(model_name, cache_dir=CACHE_DIR, max_bytes=MAX_CACHE_BYTES, workers=INSIGHT_WORKERS):
+    """Creates the worker pool and in-flight table for one model."""
+    return {
+        'model': model_name,
+        'cache_dir': cache_dir,
+        'max_bytes': max_bytes,
+        'executor': concurrent.futures.ThreadPoolExecutor(max_workers=workers, thread_name_prefix='insight'),
+        'pending': {},
+        'errors': {},
+        'lock': threading.Lock(),
+        'stats': {'requests': 0, 'cache_hits': 0, 'generated': 0, 'coalesced': 0, 'errors': 0, 'evictions': 0},
+    }
+
+def _generate(service, client, key, prompt):
+    try:
+        text = client['generate'](prompt)
+        write_cached(service['cache_dir'], key, service['model'], text)
+        evicted = evict(service['cache_dir'], service['max_bytes'])
+        with service['lock']:
+            service['stats']['generated'] += 1
+            service['stats']['evictions'] += evicted
+        return text
+    except Exception as e:
+        with service['lock']:
+            service['stats']['errors'] += 1
+            service['errors'][key] = f"An error occurred while generating insights: {e}"
+        raise
+    finally:
+        with service['lock']:
+            service['pending'].pop(key, None)
+
+def request_insight(service, client, data_summary):
+    """
+    Starts generating the insight for a summary with `client` unless it is
+    cached or already in flight, and returns its key for insight_status().
+    """
+    key = summary_key(data_summary, service['model'])
+    stats = service['stats']
+    with service['lock']:
+        stats['requests'] += 1
+        if key in service['pending']:
+            stats['coalesced'] += 1
+            return key
+    if read_cached(service['cache_dir'], key) is not None:
+        with service['lock']:
+            stats['cache_hits'] += 1
+        return key
+    prompt = build_prompt(data_summary)
+    with service['lock']:
+        # Another session may have started the same request meanwhile.
+        if key in service['pending']:
+            stats['coalesced'] += 1
+            return key
+        service['errors'].pop(key, None)
+        service['pending'][key] = service['executor'].submit(_generate, service, client, key, prompt)
+    return key
+
+def insight_status(service, key):
+    """Returns (status, text): ('pending', None), ('ready', text), ('error', message) or ('missing', None)."""
+    with service['lock']:
+        if key in service['pending']:
+            return 'pending', None
+        error = service['errors'].get(key)
+    text = read_cached(service['cache_dir'], key)
+    if text is not None:
+        return 'ready', text
+    if error:
+        return 'error', error
+    return 'missing', None
+
+def insight_stats(service):
+    """Returns a snapshot of the service counters."""
+    with service['lock']:
+        stats = dict(service['stats'])
+        stats['in_flight'] = len(service['pending'])
+    stats['model'] = service['model']
+    return stats
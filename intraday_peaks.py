@@ -0,0 +1,114 @@
+
+
+import numpy as np
+import pandas as pd
+
+# --- Intraday Peak Concurrency ---
+# Bookings only record when they start (Time_Seconds), so how long a space stays
+# occupied comes from an assumed dwell time per space type (DWELL_MINUTES). Each
+# confirmed booking then occupies its space from its start until start + dwell
+# (clipped at midnight), and the number of simultaneous occupants is counted in
+# fixed buckets of the day (15 minutes by default).
+#
+# The count is a vectorised sweep line: every booking adds +1 at its first
+# bucket and -1 after its last one. The events of all groups are sorted by
+# (group, bucket) once, so a cumulative sum over them gives the occupancy
+# after every change. The peak is the largest of these per group, together
+# with the time its bucket starts. Only buckets where something happens are
+# materialised, so memory grows with the bookings rather than with
+# groups x buckets per day.
+
+BUCKET_MINUTES = 15
+DWELL_MINUTES = {
+    'Individual Workstation': 240,
+    'Quiet Pod': 90,
+    'Small Meeting Room (2-4 pax)': 60,
+    'Medium Meeting Room (6-8 pax)': 60,
+    'Large Meeting Room (10+ pax)': 90,
+    'Collaboration Zone': 120,
+}
+DEFAULT_DWELL_MINUTES = 120
+# Seats per space, as in generate_data.SPACE_TYPES, to compare peaks with the
+# seats actually available on a floor.
+SEAT_CAPACITY = {
+    'Individual Workstation': 1,
+    'Quiet Pod': 1,
+    'Small Meeting Room (2-4 pax)': 4,
+    'Medium Meeting Room (6-8 pax)': 8,
+    'Large Meeting Room (10+ pax)': 15,
+    'Collaboration Zone': 10,
+}
+SECONDS_PER_DAY = 24 * 60 * 60
+GROUP_COLUMNS = ['Day', 'Building_ID', 'Floor', 'Space_Type_ID']
+
+def dwell_seconds(space_types):
+    """Assumed dwell time in seconds for each space type name."""
+    return np.array([DWELL_MINUTES.get(name, DEFAULT_DWELL_MINUTES) * 60 for name in space_types], dtype=np.int64)
+
+def sweep_peaks(group_codes, n_groups, start_seconds, dwell, bucket_minutes=BUCKET_MINUTES):
+    """
+    Peak simultaneous occupancy per group.
+
+    group_codes are 0..n_groups-1 for every booking; start_seconds and dwell
+    are per booking, in seconds. Returns (peak, peak_start_seconds) arrays
+    indexed by group code.
+    """
+    if not len(group_codes):
+        # A block with no confirmed bookings (e.g. all no-shows) has no peaks.
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+    bucket_seconds = bucket_minutes * 60
+    n_buckets = SECONDS_PER_DAY // bucket_seconds
+    width = n_buckets + 1
+    first = start_seconds // bucket_seconds
+    last = np.minimum((start_seconds + np.maximum(dwell, 1) - 1) // bucket_seconds, n_buckets - 1)
+    # +1 in the first bucket a booking occupies, -1 in the bucket after its last.
+    base = group_codes.astype(np.int64) * width
+    keys = np.concatenate([base + first, base + last + 1])
+    deltas = np.concatenate([np.ones(len(first), dtype=np.int64), np.full(len(first), -1, dtype=np.int64)])
+    order = np.argsort(keys)
+    keys, deltas = keys[order], deltas[order]
+    # Net change per (group, bucket) with any event.
+    changes = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+    keys = keys[changes]
+    # Every group's events sum to zero, so the running total restarts at 0 for
+    # each group and is its occupancy from that bucket on.
+    occupancy = np.cumsum(np.add.reduceat(deltas, changes))
+    groups = keys // width
+    group_starts = np.flatnonzero(np.r_[True, groups[1:] != groups[:-1]])
+    peak = np.maximum.reduceat(occupancy, group_starts)
+    # The first bucket reaching the peak, as argmax over the buckets would pick.
+    at_peak = np.flatnonzero(occupancy == np.repeat(peak, np.diff(np.r_[group_starts, len(keys)])))
+    first_at_peak = at_peak[np.r_[True, groups[at_peak][1:] != groups[at_peak][:-1]]]
+    return peak, keys[first_at_peak] % width * bucket_seconds
+
+def peaks_block(bookings, floors, dwell_by_type, bucket_minutes=BUCKET_MINUTES):
+    """
+    Peak concurrent occupancy per (Day, Building_ID, Floor, Space_Type_ID) for a
+    block of confirmed bookings with Day, Building_ID, Space_ID, Space_Type_ID
+    and Time_Seconds columns.
+
+    floors maps Space_ID to Floor and dwell_by_type Space_Type_ID to dwell
+    seconds; both are arrays indexed by ID.
+    """
+    bookings = bookings.assign(Floor=floors[bookings['Space_ID'].to_numpy()])
+    # Pack the group columns into one int64 key; factorizing that is much
+    # cheaper than factorizing the four columns together.
+    columns = {col: bookings[col].to_numpy(np.int64) for col in GROUP_COLUMNS}
+    sizes = [int(values.max()) + 1 if len(values) else 1 for values in columns.values()]
+    key = np.zeros(len(bookings), dtype=np.int64)
+    for values, size in zip(columns.values(), sizes):
+        key = key * size + values
+    group_codes, groups = pd.factorize(key)
+
+    space_types = columns['Space_Type_ID']
+    peak, peak_time = sweep_peaks(
+        group_codes, len(groups), bookings['Time_Seconds'].to_numpy(np.int64),
+        dwell_by_type[space_types], bucket_minutes
+    )
+    peaks = {}
+    for col, size in reversed(list(zip(GROUP_COLUMNS, sizes))):
+        groups, peaks[col] = np.divmod(groups, size)
+    peaks = pd.DataFrame({col: peaks[col] for col in GROUP_COLUMNS})
+    peaks['Peak_Occupancy'] = peak
+    peaks['Peak_Time_Seconds'] = peak_time
+    return peaks
@@ -0,0 +1,402 @@
+
+
+import argparse
+import datetime
+import json
+import sqlite3
+import numpy as np
+import pandas as pd
+import db_pool
+from presence_bitmaps import union_counts
+from intraday_peaks import SEAT_CAPACITY
+
+# --- KPI Engine ---
+# The dashboard's KPIs and charts are all derived from one filtered dataset:
+#   * a per-day / per-space-type aggregate of booking_rollup, joined with the
+#     daily distinct employee counts from daily_presence (a single query),
+#   * the per-day presence bitmaps for multi-day distinct counts,
+#   * the number of spaces in the selected location.
+# memory_backend.py can produce the same dataset from columns held in memory,
+# with (Day, Employee_ID) presence pairs in place of the bitmaps.
+# fetch_kpi_data() reads these once (kpi_fetchers() exposes the three reads so
+# the dashboard can run them concurrently); summarize_kpis() and
+# occupancy_trend() only work on the fetched frames and never go back to the
+# database.
+#
+# Filter values are always passed as query parameters.
+
+DB_FILE = 'workspace_analytics.db'
+EPOCH = datetime.date(1970, 1, 1)
+# Weekday names in strftime('%w') numbering; day 0 (1970-01-01) was a Thursday,
+# so the weekday of a day number is (Day + 4) % 7.
+WEEKDAY_NAMES = ['Sunday', 'Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday']
+AGG_FORMATS = {'Daily': '%Y-%m-%d', 'Weekly': '%Y-%W', 'Monthly': '%Y-%m'}
+
+def build_filters(start_day, end_day, country=None, city=None, building=None):
+    """Returns the filter parameters shared by every KPI query."""
+    return {
+        'start_day': int(start_day),
+        'end_day': int(end_day),
+        'country': country or None,
+        'city': city or None,
+        'building': building or None,
+    }
+
+def building_clause(filters, column):
+    """
+    Returns an 'AND <column> IN (...)' clause restricting Building_ID to the
+    selected location, or '' when no location is selected.
+    """
+    if filters['building']:
+        condition = "Building = :building"
+    elif filters['city']:
+        condition = "Country = :country AND City = :city"
+    elif filters['country']:
+        condition = "Country = :country"
+    else:
+        return ""
+    return f"AND {column} IN (SELECT Building_ID FROM buildings WHERE {condition})"
+
+def query_params(filters):
+    """Returns the named parameters for the KPI queries."""
+    # daily_presence stores the location levels that are not filtered on as ''.
+    return dict(
+        filters,
+        presence_country=filters['country'] or '',
+        presence_city=filters['city'] or '',
+        presence_building=filters['building'] or '',
+    )
+
+def daily_query(filters):
+    """Per-day / per-space-type booking counts with the day's distinct employees."""
+    return f"""
+        WITH rollup AS (
+            SELECT r.Day, r.Space_Type_ID, SUM(r.Bookings) AS Bookings, SUM(r.Confirmed) AS Confirmed,
+                   SUM(r.No_Shows) AS No_Shows, SUM(r.Check_Ins) AS Check_Ins
+            FROM booking_rollup r
+            WHERE r.Day BETWEEN :start_day AND :end_day {building_clause(filters, 'r.Building_ID')}
+            GROUP BY r.Day, r.Space_Type_ID
+        ),
+        presence AS (
+            SELECT p.Day, p.Employees
+            FROM daily_presence p
+            WHERE p.Country = :presence_country AND p.City = :presence_city AND p.Building = :presence_building
+              AND p.Day BETWEEN :start_day AND :end_day
+        )
+        SELECT rollup.Day, st.Space_Type, rollup.Bookings, rollup.Confirmed, rollup.No_Shows,
+               rollup.Check_Ins, presence.Employees
+        FROM rollup
+        JOIN space_types st ON st.Space_Type_ID = rollup.Space_Type_ID
+        LEFT JOIN presence ON presence.Day = rollup.Day
+        ORDER BY rollup.Day, rollup.Space_Type_ID
+    """
+
+def bitmap_query(filters):
+    """Per-day, per-building presence bitmaps for the selection."""
+    return f"""
+        SELECT bm.Day, bm.Bitmap
+        FROM presence_bitmaps bm
+        WHERE bm.Day BETWEEN :start_day AND :end_day {building_clause(filters, 'bm.Building_ID')}
+    """
+
+def spaces_query(filters):
+    """Number of spaces in the selected location."""
+    return f"SELECT COUNT(*) FROM spaces s WHERE 1 = 1 {building_clause(filters, 's.Building_ID')}"
+
+def floor_peaks_query(filters):
+    """
+    Highest intraday peak of concurrent occupants per building floor and space
+    type over the date range, with the day and time it happened and the number
+    of spaces of that type on the floor.
+    """
+    # With MAX() as the only aggregate, SQLite takes the bare Day and
+    # Peak_Time_Seconds columns from the row holding the maximum.
+    return f"""
+        SELECT bl.Building, ip.Floor, st.Space_Type, MAX(ip.Peak_Occupancy) AS Peak_Occupancy,
+               date(ip.Day * 86400, 'unixepoch') AS Peak_Date,
+               time(ip.Peak_Time_Seconds, 'unixepoch') AS Peak_Time,
+               (SELECT COUNT(*) FROM spaces s
+                WHERE s.Building_ID = ip.Building_ID AND s.Floor = ip.Floor
+                  AND s.Space_Type_ID = ip.Space_Type_ID) AS Spaces
+        FROM intraday_peaks ip
+        JOIN buildings bl ON bl.Building_ID = ip.Building_ID
+        JOIN space_types st ON st.Space_Type_ID = ip.Space_Type_ID
+        WHERE ip.Day BETWEEN :start_day AND :end_day {building_clause(filters, 'ip.Building_ID')}
+        GROUP BY ip.Building_ID, ip.Floor, ip.Space_Type_ID
+    """
+
+BUCKET_MINUTES_QUERY = "SELECT Value FROM db_metadata WHERE Key = 'intraday_bucket_minutes'"
+
+def read_bucket_minutes(conn):
+    """The intraday peak bucket size the loader used, or None if it is not recorded."""
+    row = conn.execute(BUCKET_MINUTES_QUERY).fetchone()
+    return row[0] if row else None
+
+def floor_peaks(peaks_df, top=15):
+    """Adds the peak seat utilization of each floor / space type and keeps the busiest ones."""
+    seats = peaks_df['Spaces'] * peaks_df['Space_Type'].map(SEAT_CAPACITY).fillna(1)
+    peaks_df = peaks_df.assign(
+        Floor_Label=peaks_df['Building'] + ' L' + peaks_df['Floor'].astype(str) + ' - ' + peaks_df['Space_Type'],
+        Seats=seats,
+        Peak_Utilization=peaks_df['Peak_Occupancy'] / seats.where(seats > 0) * 100,
+    )
+    return peaks_df.sort_values(['Peak_Utilization', 'Peak_Occupancy'], ascending=False).head(top)
+
+# --- Filter Domain ---
+# The sidebar's choices: the first and last booked day and every
+# (Country, City, Building). The loader stores them as JSON under the
+# 'filter_domain' key of db_metadata, so the dashboard reads one row instead
+# of querying bookings and buildings.
+
+FILTER_DOMAIN_QUERY = "SELECT Value FROM db_metadata WHERE Key = 'filter_domain'"
+
+def compute_filter_domain(conn):
+    """Computes the filter domain from the bookings and buildings tables."""
+    min_day, max_day = conn.execute("SELECT MIN(Day), MAX(Day) FROM bookings").fetchone()
+    locations = conn.execute("SELECT Country, City, Building FROM buildings ORDER BY Country, City, Building")
+    return {'min_day': min_day, 'max_day': max_day, 'locations': [list(row) for row in locations]}
+
+def read_filter_domain(conn):
+    """Returns the stored filter domain, computing it for databases loaded before it was stored."""
+    try:
+        row = conn.execute(FILTER_DOMAIN_QUERY).fetchone()
+    except sqlite3.Error:
+        row = None
+    return json.loads(row[0]) if row else compute_filter_domain(conn)
+
+def kpi_queries(filters):
+    """Returns {name: SQL} for the reads behind the KPIs; all take query_params(filters)."""
+    return {
+        'daily': daily_query(filters),
+        'bitmaps': bitmap_query(filters),
+        'total_spaces': spaces_query(filters),
+    }
+
+def kpi_fetchers(filters):
+    """
+    Returns {name: function(conn)} for the independent reads behind the KPIs,
+    so callers can run them one after another or concurrently.
+    """
+    params = query_params(filters)
+    queries = kpi_queries(filters)
+    return {
+        'daily': lambda conn: pd.read_sql_query(queries['daily'], conn, params=params),
+        'bitmaps': lambda conn: conn.execute(queries['bitmaps'], params).fetchall(),
+        'total_spaces': lambda conn: conn.execute(queries['total_spaces'], params).fetchone()[0],
+    }
+
+def chart_queries(filters):
+    """Returns {name: SQL} for the reads behind the charts that are not derived from the KPI data."""
+    return {
+        'floor_peaks': floor_peaks_query(filters),
+        'bucket_minutes': BUCKET_MINUTES_QUERY,
+    }
+
+def chart_fetchers(filters):
+    """Returns {name: function(conn)} for chart_queries(), alongside kpi_fetchers()."""
+    params = query_params(filters)
+    queries = chart_queries(filters)
+    return {
+        'floor_peaks': lambda conn: pd.read_sql_query(queries['floor_peaks'], conn, params=params),
+        'bucket_minutes': read_bucket_minutes,
+    }
+
+def fetch_kpi_data(conn, filters):
+    """
+    Reads everything the KPIs need for one filter selection. The result is a
+    plain dict so it can be cached and pickled.
+    """
+    return {name: fetch(conn) for name, fetch in kpi_fetchers(filters).items()}
+
+def day_to_date(day):
+    """Converts a stored day number to a date."""
+    return EPOCH + datetime.timedelta(days=int(day))
+
+def presence_by_day(daily):
+    """Returns the distinct employees per day (one row per day with presence)."""
+    presence = daily.drop_duplicates('Day').dropna(subset=['Employees'])[['Day', 'Employees']]
+    return presence.astype({'Employees': np.int64})
+
+def rate(numerator, denominator):
+    """Percentage, or 0 when there is nothing to divide by."""
+    return float(numerator) / denominator * 100 if denominator else 0
+
+# Key spaces up to this size are deduplicated by marking a boolean array
+# (linear time) rather than sorting.
+MAX_MARK_KEYS = 64_000_000
+
+def distinct_keys(keys, n_keys):
+    """Sorted distinct values of a non-negative integer array with values below n_keys."""
+    if n_keys <= MAX_MARK_KEYS:
+        seen = np.zeros(n_keys, dtype=bool)
+        seen[keys] = True
+        return np.flatnonzero(seen)
+    keys = np.sort(keys)
+    return keys[np.concatenate(([True], keys[1:] != keys[:-1]))] if len(keys) else keys
+
+def distinct_counts(data, label_of_day):
+    """
+    Returns {label: distinct employees}, grouping days by label_of_day(day).
+    Works on the presence bitmaps (SQLite) or on the presence pairs (memory).
+    """
+    if 'bitmaps' in data:
+        labels = {}
+        for day, _ in data['bitmaps']:
+            if day not in labels:
+                labels[day] = label_of_day(day)
+        return union_counts((labels[day], blob) for day, blob in data['bitmaps'])
+    days, employee_ids = data['presence']
+    if len(days) == 0:
+        return {}
+    first_day = int(days.min())
+    day_labels = [label_of_day(day) for day in range(first_day, int(days.max()) + 1)]
+    label_codes, label_names = pd.factorize(pd.Series(day_labels))
+    n_employees = int(employee_ids.max()) + 1
+    keys = label_codes[days - first_day].astype(np.int64) * n_employees + employee_ids
+    counts = np.bincount(distinct_keys(keys, len(label_names) * n_employees) // n_employees,
+                         minlength=len(label_names))
+    return {label: int(count) for label, count in zip(label_names, counts) if count}
+
+def summarize_kpis(data):
+    """Derives the KPI values and the day-of-week and space-type tables."""
+    daily = data['daily']
+    presence = presence_by_day(daily)
+
+    peak_occupancy = distinct_counts(data, lambda day: 0).get(0, 0)
+    avg_daily_users = presence['Employees'].mean() if not presence.empty else 0
+    total_spaces = data['total_spaces']
+
+    weekday = (presence['Day'] + 4) % 7
+    day_of_week = presence.groupby(weekday)['Employees'].mean()
+    day_of_week_df = pd.DataFrame({
+        'DayOfWeek': [WEEKDAY_NAMES[i] for i in day_of_week.index],
+        'AvgOccupancy': day_of_week.to_numpy(dtype=float),
+    })
+
+    space_types = daily.groupby('Space_Type', sort=False)['Confirmed'].sum()
+    space_types = space_types[space_types > 0].sort_values(ascending=False, kind='stable')
+    space_type_df = pd.DataFrame({'Space_Type': space_types.index, 'BookingCount': space_types.to_numpy()})
+
+    return {
+        'peak_occupancy': peak_occupancy,
+        'total_spaces': total_spaces,
+        'avg_daily_users': avg_daily_users,
+        'avg_utilization': avg_daily_users / total_spaces * 100 if total_spaces > 0 else 0,
+        'no_show_rate': rate(daily['No_Shows'].sum(), daily['Bookings'].sum()),
+        'adhoc_rate': rate(daily['Check_Ins'].sum(), daily['Confirmed'].sum()),
+        'day_of_week_df': day_of_week_df,
+        'space_type_df': space_type_df,
+    }
+
+def occupancy_trend(data, agg_level):
+    """Returns distinct employees per day, week or month as AggDate / Occupancy."""
+    date_format = AGG_FORMATS[agg_level]
+    if agg_level == 'Daily':
+        presence = presence_by_day(data['daily'])
+        return pd.DataFrame({
+            'AggDate': [day_to_date(day).strftime(date_format) for day in presence['Day']],
+            'Occupancy': presence['Employees'].to_numpy(),
+        })
+    counts = distinct_counts(data, lambda day: day_to_date(day).strftime(date_format))
+    return pd.DataFrame(sorted(counts.items()), columns=['AggDate', 'Occupancy'])
+
+# --- Verification ---
+# The KPIs as the dashboard computed them before the rollup tables existed,
+# straight from the bookings table. `python kpi_engine.py --verify` checks the
+# engine against them for a range of filter selections.
+CONFIRMED = "b.Status_ID = (SELECT Status_ID FROM booking_statuses WHERE Booking_Status = 'Confirmed')"
+NO_SHOW = "b.Status_ID = (SELECT Status_ID FROM booking_statuses WHERE Booking_Status = 'No-Show')"
+CHECK_IN = "b.Activity_Type_ID = (SELECT Activity_Type_ID FROM activity_types WHERE Activity_Type = 'Check-in')"
+
+def legacy_kpis(conn, filters, agg_level):
+    """Computes the KPIs with the original per-chart queries over bookings."""
+    params = query_params(filters)
+    in_range = f"b.Day BETWEEN :start_day AND :end_day {building_clause(filters, 'b.Building_ID')}"
+    base_query = f"FROM bookings b WHERE {CONFIRMED} AND {in_range}"
+
+    def scalar(query):
+        return conn.execute(query, params).fetchone()[0]
+
+    def frame(query):
+        return pd.read_sql_query(query, conn, params=params)
+
+    total_spaces = scalar(spaces_query(filters))
+    avg_daily_users = scalar(f"SELECT AVG(DailyUsers) FROM (SELECT COUNT(DISTINCT b.Employee_ID) as DailyUsers {base_query} GROUP BY b.Day)") or 0
+    day_of_week_df = frame(f"SELECT daily.Day, AVG(daily.Occupancy) as AvgOccupancy FROM (SELECT b.Day, COUNT(DISTINCT b.Employee_ID) as Occupancy {base_query} GROUP BY b.Day) as daily GROUP BY (daily.Day + 4) % 7 ORDER BY (daily.Day + 4) % 7")
+    day_of_week_df.insert(0, 'DayOfWeek', [WEEKDAY_NAMES[(day + 4) % 7] for day in day_of_week_df.pop('Day')])
+    trend_df = frame(f"SELECT strftime('{AGG_FORMATS[agg_level]}', b.Day * 86400, 'unixepoch') as AggDate, COUNT(DISTINCT b.Employee_ID) as Occupancy {base_query} GROUP BY AggDate ORDER BY AggDate")
+    return {
+        'peak_occupancy': scalar(f"SELECT COUNT(DISTINCT b.Employee_ID) {base_query}"),
+        'total_spaces': total_spaces,
+        'avg_daily_users': avg_daily_users,
+        'avg_utilization': avg_daily_users / total_spaces * 100 if total_spaces > 0 else 0,
+        'no_show_rate': scalar(f"SELECT CAST(SUM(CASE WHEN {NO_SHOW} THEN 1 ELSE 0 END) AS REAL) / COUNT(*) * 100 FROM bookings b WHERE {in_range}") or 0,
+        'adhoc_rate': scalar(f"SELECT CAST(SUM(CASE WHEN {CHECK_IN} THEN 1 ELSE 0 END) AS REAL) / COUNT(*) * 100 {base_query}") or 0,
+        'day_of_week_df': day_of_week_df,
+        'space_type_df': frame(f"SELECT st.Space_Type, agg.BookingCount FROM (SELECT b.Space_Type_ID, COUNT(*) as BookingCount {base_query} GROUP BY b.Space_Type_ID) as agg JOIN space_types st ON st.Space_Type_ID = agg.Space_Type_ID ORDER BY BookingCount DESC, st.Space_Type"),
+        'occupancy_trend_df': trend_df,
+    }
+
+def compare_kpis(expected, actual):
+    """Returns a list of the KPI names whose values differ."""
+    mismatches = []
+    for name, value in expected.items():
+        other = actual[name]
+        if isinstance(value, pd.DataFrame):
+            # Ties in the space type ranking may come back in either order.
+            if name == 'space_type_df':
+                value, other = (df.sort_values(list(df.columns)).reset_index(drop=True) for df in (value, other))
+            try:
+                pd.testing.assert_frame_equal(value.reset_index(drop=True), other.reset_index(drop=True), check_dtype=False)
+            except AssertionError:
+                mismatches.append(name)
+        elif abs(value - other) > 1e-9 * max(1, abs(value)):
+            mismatches.append(name)
+    return mismatches
+
+def verification_filters(conn):
+    """Filter selections covering every location level and a few date ranges."""
+    min_day, max_day = conn.execute("SELECT MIN(Day), MAX(Day) FROM bookings").fetchone()
+    ranges = [(min_day, max_day), (max_day - 30, max_day), (min_day, min_day + 90)]
+    locations = [(None, None, None)]
+    for country, city, building in conn.execute("SELECT Country, City, MIN(Building) FROM buildings GROUP BY Country, City"):
+        locations += [(country, None, None), (country, city, None), (country, city, building)]
+    for start_day, end_day in ranges:
+        for country, city, building in dict.fromkeys(locations):
+            yield build_filters(start_day, end_day, country, city, building)
+
+def verify(db_file, backend='sqlite'):
+    """Checks the engine against the legacy queries; returns the number of failures."""
+    conn = sqlite3.connect(db_pool.database_uri(db_file), uri=True)
+    if backend == 'memory':
+        import memory_backend
+        store = memory_backend.load_store(conn)
+    checked = failed = 0
+    for filters in verification_filters(conn):
+        if backend == 'memory':
+            data = memory_backend.fetch_kpi_data(store, filters)
+        else:
+            data = fetch_kpi_data(conn, filters)
+        for agg_level in AGG_FORMATS:
+            actual = dict(summarize_kpis(data), occupancy_trend_df=occupancy_trend(data, agg_level))
+            mismatches = compare_kpis(legacy_kpis(conn, filters, agg_level), actual)
+            checked += 1
+            if mismatches:
+                failed += 1
+                print(f"  MISMATCH {agg_level} {filters}: {', '.join(mismatches)}")
+    conn.close()
+    print(f"Checked {checked} filter selections ({backend} backend) against the legacy queries: "
+          f"{failed} mismatches.")
+    return failed
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Dashboard KPI engine.')
+    parser.add_argument('--db', default=DB_FILE, help='SQLite database to read.')
+    parser.add_argument('--verify', action='store_true',
+                        help='Check the engine against the legacy per-chart queries over bookings.')
+    parser.add_argument('--backend', choices=['sqlite', 'memory'], default='sqlite',
+                        help='Backend to verify: SQLite rollups or the in-memory columns.')
+    args = parser.parse_args()
+    if args.verify:
+        raise SystemExit(1 if verify(args.db, args.backend) else 0)
+    parser.print_help()
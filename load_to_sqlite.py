@@ -1,42 +1,125 @@
 
 
 import pandas as pd
+import numpy as np
+import argparse
+import datetime
+import hashlib
+import json
 import sqlite3
 import os
+import shutil
+import time
+from presence_bitmaps import encode_bitmap
+from intraday_peaks import BUCKET_MINUTES, dwell_seconds, peaks_block
+from kpi_engine import compute_filter_domain
+from db_pool import database_uri
 
 # --- Configuration ---
 CSV_FILE = 'raw_workspace_data.csv'
 DB_FILE = 'workspace_analytics.db'
 
+# Rows read, normalised and inserted per transaction. Memory use is bounded by
+# this, not by the size of the input.
+CHUNK_SIZE = 500_000
+
+# Load modes:
+# - full:    drop every table and rebuild the database from the source file.
+# - append:  upsert spaces/employees and add only the bookings dated after the
+#            high-water mark (the latest date already loaded).
+# - replace: upsert spaces/employees and replace every date present in the
+#            source file (e.g. to re-deliver a corrected day).
+# In the incremental modes a file whose checksum is already recorded in the
+# load manifest is skipped, so re-running the same nightly load is a no-op.
+LOAD_MODES = ['full', 'append', 'replace']
+
+# Settings applied to the loading connection only. The load writes to a
+# staging file nobody reads (see "Staging and Publishing"), so durability is
+# traded for throughput: WAL journal, fsyncs skipped and sorting for index
+# builds in a large in-memory cache. A crash can only damage the staging file,
+# which the next load starts over.
+LOAD_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'OFF',
+    'cache_size': -262144,  # 256 MiB (negative values are KiB)
+    'temp_store': 'MEMORY',
+}
+
 # --- Schema Definition ---
-# We will normalize the data into three tables:
-# 1. spaces: Static information about each physical space.
-# 2. employees: Static information about each employee.
-# 3. bookings: Transactional data linking employees and spaces over time.
+# We will normalize the data into:
+# 1. buildings: One row per building with its Region/Country/City.
+# 2. spaces: Static information about each physical space.
+# 3. employees: Static information about each employee.
+# 4. bookings: Transactional data linking employees and spaces over time.
+# 5. space_types, activity_types, booking_statuses: small lookup tables so the
+#    repeated text values are stored as integer codes.
+# A further table, load_manifest, records every file that has been loaded;
+# db_metadata holds the data generation, a counter bumped by every load that
+# the dashboard uses to tell when its cached results are stale, and the
+# sidebar's filter domain (date bounds and locations, see kpi_engine.py); and
+# the rollup tables (booking_rollup, daily_presence, presence_bitmaps) hold the
+# pre-aggregated daily KPIs the dashboard reads; see "Rollup Tables" below.
+#
+# Bookings are stored compactly: `Day` is the number of days since 1970-01-01
+# and `Time_Seconds` the seconds since midnight. The Building_ID and
+# Space_Type_ID of the booked space are denormalized onto each booking so the
+# dashboard's location and space type breakdowns never have to join spaces.
+# The space_details and booking_details views decode everything back to the
+# original text columns for ad-hoc querying.
+
+LOOKUP_TABLES = {
+    'space_types': ('Space_Type_ID', 'Space_Type'),
+    'activity_types': ('Activity_Type_ID', 'Activity_Type'),
+    'booking_statuses': ('Status_ID', 'Booking_Status'),
+}
+TABLES = ['bookings', 'spaces', 'employees', 'buildings', *LOOKUP_TABLES, 'load_manifest', 'db_metadata',
+          'booking_rollup', 'daily_presence', 'presence_bitmaps', 'intraday_peaks']
+VIEWS = ['booking_details', 'space_details']
 
-def create_database_schema(cursor):
+def create_database_schema(cursor, drop_existing=True):
     """Defines and creates the database tables."""
     # Drop tables if they exist to ensure a fresh start
-    cursor.execute("DROP TABLE IF EXISTS bookings")
-    cursor.execute("DROP TABLE IF EXISTS spaces")
-    cursor.execute("DROP TABLE IF EXISTS employees")
+    if drop_existing:
+        for view_name in VIEWS:
+            cursor.execute(f"DROP VIEW IF EXISTS {view_name}")
+        for table_name in TABLES:
+            cursor.execute(f"DROP TABLE IF EXISTS {table_name}")
 
-    # Create spaces table
+    # Create lookup tables
+    for table_name, (id_col, name_col) in LOOKUP_TABLES.items():
+        cursor.execute(f"""
+            CREATE TABLE IF NOT EXISTS {table_name} (
+                {id_col} INTEGER PRIMARY KEY,
+                {name_col} TEXT UNIQUE
+            )
+        """)
+
+    # Create buildings table
     cursor.execute("""
-        CREATE TABLE spaces (
-            Space_ID INTEGER PRIMARY KEY,
+        CREATE TABLE IF NOT EXISTS buildings (
+            Building_ID INTEGER PRIMARY KEY,
+            Building TEXT UNIQUE,
             Region TEXT,
             Country TEXT,
-            City TEXT,
-            Building TEXT,
+            City TEXT
+        )
+    """)
+
+    # Create spaces table
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS spaces (
+            Space_ID INTEGER PRIMARY KEY,
+            Building_ID INTEGER,
             Floor INTEGER,
-            Space_Type TEXT
+            Space_Type_ID INTEGER,
+            FOREIGN KEY (Building_ID) REFERENCES buildings (Building_ID),
+            FOREIGN KEY (Space_Type_ID) REFERENCES space_types (Space_Type_ID)
         )
     """)
 
     # Create employees table
     cursor.execute("""
-        CREATE TABLE employees (
+        CREATE TABLE IF NOT EXISTS employees (
             Employee_ID INTEGER PRIMARY KEY,
             Department TEXT
         )
@@ -44,69 +127,771 @@ def create_database_schema(cursor):
 
     # Create bookings table
     cursor.execute("""
-        CREATE TABLE bookings (
-            Booking_ID INTEGER PRIMARY KEY AUTOINCREMENT,
-            Date TEXT,
-            Time TEXT,
+        CREATE TABLE IF NOT EXISTS bookings (
+            Booking_ID INTEGER PRIMARY KEY,
+            Day INTEGER,
+            Time_Seconds INTEGER,
             Employee_ID INTEGER,
             Space_ID INTEGER,
-            Activity_Type TEXT,
-            Booking_Status TEXT,
+            Building_ID INTEGER,
+            Space_Type_ID INTEGER,
+            Activity_Type_ID INTEGER,
+            Status_ID INTEGER,
             FOREIGN KEY (Employee_ID) REFERENCES employees (Employee_ID),
             FOREIGN KEY (Space_ID) REFERENCES spaces (Space_ID)
         )
     """)
 
-def populate_database():
+    # Create load manifest table
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS load_manifest (
+            Load_ID INTEGER PRIMARY KEY,
+            File TEXT,
+            Checksum TEXT,
+            Load_Mode TEXT,
+            Row_Count INTEGER,
+            Rows_Loaded INTEGER,
+            Min_Date TEXT,
+            Max_Date TEXT,
+            Loaded_At TEXT
+        )
+    """)
+
+    # Create metadata table (Key/Value pairs such as the data generation)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS db_metadata (
+            Key TEXT PRIMARY KEY,
+            Value
+        )
+    """)
+
+    # Create rollup tables
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS booking_rollup (
+            Day INTEGER,
+            Building_ID INTEGER,
+            Space_Type_ID INTEGER,
+            Department TEXT,
+            Bookings INTEGER,
+            Confirmed INTEGER,
+            No_Shows INTEGER,
+            Check_Ins INTEGER,
+            Employees INTEGER,
+            PRIMARY KEY (Day, Building_ID, Space_Type_ID, Department)
+        ) WITHOUT ROWID
+    """)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS daily_presence (
+            Country TEXT,
+            City TEXT,
+            Building TEXT,
+            Day INTEGER,
+            Employees INTEGER,
+            PRIMARY KEY (Country, City, Building, Day)
+        ) WITHOUT ROWID
+    """)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS presence_bitmaps (
+            Day INTEGER,
+            Building_ID INTEGER,
+            Employees INTEGER,
+            Bitmap BLOB,
+            PRIMARY KEY (Day, Building_ID)
+        )
+    """)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS intraday_peaks (
+            Day INTEGER,
+            Building_ID INTEGER,
+            Floor INTEGER,
+            Space_Type_ID INTEGER,
+            Peak_Occupancy INTEGER,
+            Peak_Time_Seconds INTEGER,
+            PRIMARY KEY (Day, Building_ID, Floor, Space_Type_ID)
+        ) WITHOUT ROWID
+    """)
+
+    # Create decoding views
+    cursor.execute("""
+        CREATE VIEW IF NOT EXISTS space_details AS
+        SELECT s.Space_ID, bd.Region, bd.Country, bd.City, bd.Building, s.Floor, st.Space_Type
+        FROM spaces s
+        JOIN buildings bd ON s.Building_ID = bd.Building_ID
+        JOIN space_types st ON s.Space_Type_ID = st.Space_Type_ID
+    """)
+    cursor.execute("""
+        CREATE VIEW IF NOT EXISTS booking_details AS
+        SELECT b.Booking_ID, date(b.Day * 86400, 'unixepoch') AS Date, time(b.Time_Seconds, 'unixepoch') AS Time,
+               b.Employee_ID, e.Department, a.Activity_Type, b.Space_ID, bs.Booking_Status,
+               sd.Region, sd.Country, sd.City, sd.Building, sd.Floor, sd.Space_Type
+        FROM bookings b
+        JOIN employees e ON b.Employee_ID = e.Employee_ID
+        JOIN activity_types a ON b.Activity_Type_ID = a.Activity_Type_ID
+        JOIN booking_statuses bs ON b.Status_ID = bs.Status_ID
+        JOIN space_details sd ON b.Space_ID = sd.Space_ID
+    """)
+
+def check_schema(cursor):
+    """Refuses to load incrementally into a database built with the old text schema."""
+    columns = [row[1] for row in cursor.execute("PRAGMA table_info(bookings)")]
+    if columns and 'Day' not in columns:
+        raise SystemExit("Error: the database uses an older schema. Run a full load (--mode full) first.")
+
+# Rows sampled per index when an incremental load refreshes the statistics.
+ANALYSIS_LIMIT = 1000
+
+def has_statistics(cursor):
+    return cursor.execute("SELECT 1 FROM sqlite_master WHERE name = 'sqlite_stat1'").fetchone() is not None
+
+def create_indexes(cursor, full_analyze=True):
     """
-    Reads the raw CSV data, normalizes it, and populates the
-    SQLite database tables.
+    Creates the secondary indexes. Called after the bulk insert: building an
+    index once over sorted data is much cheaper than maintaining it row by row.
+
+    The bookings indexes cover the dashboard queries exactly:
+    - idx_bookings_status_day: every 'Confirmed' query (status equality, Day
+      range, optional Building_ID filter, then the columns they count or
+      group by), answered from the index without touching the table.
+    - idx_bookings_day: the no-show rate (all statuses), MIN/MAX(Day) and
+      date-partition deletes.
     """
-    if not os.path.exists(CSV_FILE):
-        print(f"Error: The file '{CSV_FILE}' was not found.")
-        print("Please run 'generate_data.py' first.")
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_bookings_status_day
+        ON bookings (Status_ID, Day, Building_ID, Employee_ID, Space_Type_ID, Activity_Type_ID)
+    """)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_bookings_day ON bookings (Day, Building_ID, Status_ID)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_spaces_building ON spaces (Building_ID, Space_Type_ID)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_buildings_location ON buildings (Country, City, Building)")
+    if full_analyze or not has_statistics(cursor):
+        cursor.execute("ANALYZE")
+    else:
+        # An incremental load only touches a few days, so the full statistics
+        # stay representative: refresh just the tables whose size has drifted,
+        # sampling at most ANALYSIS_LIMIT rows per index, so the cost does not
+        # grow with the history.
+        cursor.execute(f"PRAGMA analysis_limit = {ANALYSIS_LIMIT}")
+        cursor.execute("PRAGMA optimize = 0x10002")
+
+# --- Rollup Tables ---
+# The dashboard's KPIs are sums over a few small tables maintained here rather
+# than scans of the raw bookings:
+# - booking_rollup: per (Day, Building, Space_Type, Department) counts of all,
+#   confirmed, no-show and confirmed check-in bookings, plus the number of
+#   distinct employees with a confirmed booking.
+# - daily_presence: distinct employees present per day for every location the
+#   dashboard can filter on. Distinct counts cannot be summed across buildings,
+#   so each level is stored separately; '' means "all" (Country/City/Building
+#   all '' is the whole region, Country set and City/Building '' one country).
+# - presence_bitmaps: per (Day, Building) bitmap of the employees present (see
+#   presence_bitmaps.py), so distinct counts over several days are exact
+#   bitmap unions rather than scans of the raw bookings.
+# - intraday_peaks: per (Day, Building, Floor, Space_Type) peak number of
+#   simultaneous occupants and when it starts, from the booking times and an
+#   assumed dwell time (see intraday_peaks.py). The bucket size is recorded in
+#   db_metadata as intraday_bucket_minutes.
+# All of them are rebuilt for the day range touched by a load. Bookings are read back
+# ROLLUP_BLOCK_DAYS at a time and aggregated with pandas, which keeps memory
+# bounded and is several times faster than the equivalent GROUP BY queries.
+
+ROLLUP_BLOCK_DAYS = 28
+ROLLUP_KEYS = ['Day', 'Building_ID', 'Space_Type_ID', 'Department']
+PRESENCE_LEVELS = [[], ['Country'], ['Country', 'City'], ['Country', 'City', 'Building']]
+LOCATION_COLUMNS = ['Country', 'City', 'Building']
+
+def lookup_id(cursor, table_name, value):
+    """Returns the id of one lookup value (-1 if it was never loaded)."""
+    id_col, name_col = LOOKUP_TABLES[table_name]
+    row = cursor.execute(f"SELECT {id_col} FROM {table_name} WHERE {name_col} = ?", (value,)).fetchone()
+    return row[0] if row else -1
+
+def iter_booking_blocks(cursor, min_day, max_day, columns, block_days=ROLLUP_BLOCK_DAYS):
+    """
+    Yields the given integer columns of the stored bookings between min_day
+    and max_day, block_days at a time.
+    """
+    for block_start in range(min_day, max_day + 1, block_days):
+        block_end = min(block_start + block_days - 1, max_day)
+        rows = cursor.execute(
+            f"SELECT {', '.join(columns)} FROM bookings WHERE Day BETWEEN ? AND ?", (block_start, block_end)
+        ).fetchall()
+        if rows:
+            # Going through one int64 array is much cheaper than building the
+            # DataFrame from the row tuples directly.
+            yield pd.DataFrame(np.array(rows, dtype=np.int64), columns=columns)
+
+def rollup_block(bookings, departments, buildings, ids):
+    """Aggregates one block of bookings into booking_rollup, daily_presence and presence_bitmaps rows."""
+    confirmed = (bookings['Status_ID'] == ids['confirmed']).to_numpy()
+    bookings = bookings.assign(
+        Department=bookings['Employee_ID'].map(departments),
+        Confirmed=confirmed,
+        No_Shows=bookings['Status_ID'] == ids['no_show'],
+        Check_Ins=confirmed & (bookings['Activity_Type_ID'] == ids['check_in']),
+    )
+    counts = bookings.groupby(ROLLUP_KEYS, sort=False).agg(
+        Bookings=('Day', 'size'), Confirmed=('Confirmed', 'sum'),
+        No_Shows=('No_Shows', 'sum'), Check_Ins=('Check_Ins', 'sum'),
+    )
+    employees = bookings[confirmed].drop_duplicates(ROLLUP_KEYS + ['Employee_ID']).groupby(ROLLUP_KEYS).size()
+    rollup = counts.join(employees.rename('Employees')).fillna({'Employees': 0}).reset_index()
+
+    present = bookings.loc[confirmed, ['Day', 'Building_ID', 'Employee_ID']].drop_duplicates()
+    bitmaps = pd.DataFrame(
+        [(day, building_id, len(ids), encode_bitmap(ids))
+         for (day, building_id), ids in present.groupby(['Day', 'Building_ID'])['Employee_ID']],
+        columns=['Day', 'Building_ID', 'Employees', 'Bitmap']
+    )
+    present = present.join(buildings, on='Building_ID')
+    presence = []
+    for level in PRESENCE_LEVELS:
+        daily = present.drop_duplicates(level + ['Day', 'Employee_ID']).groupby(level + ['Day']).size()
+        daily = daily.rename('Employees').reset_index()
+        for col in LOCATION_COLUMNS:
+            if col not in level:
+                daily[col] = ''
+        presence.append(daily)
+    return rollup, pd.concat(presence, ignore_index=True), bitmaps
+
+def refresh_rollups(cursor, min_day, max_day):
+    """Recomputes the rollup tables for the days between min_day and max_day."""
+    departments = pd.Series(dict(cursor.execute("SELECT Employee_ID, Department FROM employees").fetchall()))
+    buildings = pd.DataFrame(
+        cursor.execute("SELECT Building_ID, Country, City, Building FROM buildings").fetchall(),
+        columns=['Building_ID'] + LOCATION_COLUMNS
+    ).set_index('Building_ID')
+    ids = {
+        'confirmed': lookup_id(cursor, 'booking_statuses', 'Confirmed'),
+        'no_show': lookup_id(cursor, 'booking_statuses', 'No-Show'),
+        'check_in': lookup_id(cursor, 'activity_types', 'Check-in'),
+    }
+
+    cursor.execute("BEGIN")
+    cursor.execute("DELETE FROM booking_rollup WHERE Day BETWEEN ? AND ?", (min_day, max_day))
+    cursor.execute("DELETE FROM daily_presence WHERE Day BETWEEN ? AND ?", (min_day, max_day))
+    cursor.execute("DELETE FROM presence_bitmaps WHERE Day BETWEEN ? AND ?", (min_day, max_day))
+    # These columns are all in idx_bookings_status_day, so the read is index-only.
+    columns = ['Day', 'Building_ID', 'Space_Type_ID', 'Employee_ID', 'Status_ID', 'Activity_Type_ID']
+    for bookings in iter_booking_blocks(cursor, min_day, max_day, columns):
+        rollup, presence, bitmaps = rollup_block(bookings, departments, buildings, ids)
+        insert_rows(cursor, 'booking_rollup', ROLLUP_KEYS + ['Bookings', 'Confirmed', 'No_Shows', 'Check_Ins', 'Employees'], rollup)
+        insert_rows(cursor, 'daily_presence', LOCATION_COLUMNS + ['Day', 'Employees'], presence)
+        insert_rows(cursor, 'presence_bitmaps', ['Day', 'Building_ID', 'Employees', 'Bitmap'], bitmaps)
+    cursor.execute("COMMIT")
+
+def refresh_intraday_peaks(cursor, min_day, max_day, bucket_minutes):
+    """Recomputes intraday_peaks for the days between min_day and max_day."""
+    floors = np.zeros(cursor.execute("SELECT COALESCE(MAX(Space_ID), 0) + 1 FROM spaces").fetchone()[0], dtype=np.int64)
+    space_ids, space_floors = np.array(cursor.execute("SELECT Space_ID, Floor FROM spaces").fetchall(), dtype=np.int64).T
+    floors[space_ids] = space_floors
+    space_types = dict(cursor.execute("SELECT Space_Type_ID, Space_Type FROM space_types").fetchall())
+    dwell_by_type = np.zeros(max(space_types) + 1, dtype=np.int64)
+    dwell_by_type[list(space_types)] = dwell_seconds(space_types.values())
+    confirmed = lookup_id(cursor, 'booking_statuses', 'Confirmed')
+
+    cursor.execute("BEGIN")
+    cursor.execute("DELETE FROM intraday_peaks WHERE Day BETWEEN ? AND ?", (min_day, max_day))
+    columns = ['Day', 'Building_ID', 'Space_ID', 'Space_Type_ID', 'Time_Seconds', 'Status_ID']
+    for bookings in iter_booking_blocks(cursor, min_day, max_day, columns):
+        bookings = bookings[bookings['Status_ID'] == confirmed]
+        peaks = peaks_block(bookings, floors, dwell_by_type, bucket_minutes)
+        insert_rows(cursor, 'intraday_peaks', list(peaks.columns), peaks)
+    write_metadata(cursor, 'intraday_bucket_minutes', bucket_minutes)
+    cursor.execute("COMMIT")
+
+def apply_pragmas(cursor, pragmas):
+    """Applies a dict of PRAGMA settings to the connection."""
+    for name, value in pragmas.items():
+        cursor.execute(f"PRAGMA {name} = {value}")
+
+# --- Source Reading ---
+
+BUILDING_COLUMNS = ['Building', 'Region', 'Country', 'City']
+SPACE_COLUMNS = ['Space_ID', 'Building_ID', 'Floor', 'Space_Type_ID']
+EMPLOYEE_COLUMNS = ['Employee_ID', 'Department']
+BOOKING_COLUMNS = ['Day', 'Time_Seconds', 'Employee_ID', 'Space_ID', 'Building_ID', 'Space_Type_ID',
+                   'Activity_Type_ID', 'Status_ID']
+
+def iter_source_chunks(source, chunksize, after_date=None):
+    """
+    Yields the source data as DataFrames of at most `chunksize` rows.
+
+    `source` is either the CSV written by generate_data.py or its Parquet
+    dataset directory (`--format parquet`). For Parquet, `after_date` prunes
+    whole Date partitions so only the new days are read.
+    """
+    if os.path.isdir(source) or source.endswith('.parquet'):
+        import pyarrow as pa
+        import pyarrow.dataset as ds
+        dataset = ds.dataset(source, format='parquet', partitioning='hive')
+        date_filter = ds.field('Date') > after_date if after_date else None
+        # The dataset yields one small batch per Date/Country file; coalesce
+        # them so every transaction is a full chunk.
+        batches, rows = [], 0
+        for batch in dataset.to_batches(batch_size=chunksize, filter=date_filter):
+            batches.append(batch)
+            rows += batch.num_rows
+            if rows >= chunksize:
+                yield pa.Table.from_batches(batches).to_pandas()
+                batches, rows = [], 0
+        if batches:
+            yield pa.Table.from_batches(batches).to_pandas()
+    else:
+        yield from pd.read_csv(source, chunksize=chunksize)
+
+def normalize_chunk(df):
+    """Brings a source chunk into the layout stored in the database."""
+    df['Day'] = to_day_numbers(df['Date'])
+    df['Time_Seconds'] = to_seconds(df['Time'])
+    return df
+
+# The helpers below convert each distinct value once and broadcast the result
+# back to the rows with pd.factorize, so their cost does not grow with the
+# number of bookings.
+
+def to_day_numbers(dates):
+    """Converts ISO date strings to days since 1970-01-01."""
+    codes, uniques = pd.factorize(dates)
+    # Dates are already ISO formatted by the generator; only strip any time part.
+    days = pd.to_datetime(pd.Index(uniques).astype(str).str.slice(0, 10)).values.astype('datetime64[D]').astype(np.int64)
+    return days[codes]
+
+def to_seconds(times):
+    """Converts 'HH:MM:SS[.ffffff]' strings (CSV) to whole seconds since midnight."""
+    # The Parquet output already stores Time as integer seconds of the day.
+    if pd.api.types.is_numeric_dtype(times):
+        return times.to_numpy(dtype=np.int64)
+    codes, uniques = pd.factorize(times)
+    seconds = pd.to_timedelta(pd.Index(uniques).astype(str)).total_seconds().to_numpy().astype(np.int64)
+    return seconds[codes]
+
+def day_to_iso(day):
+    """Converts a day number back to an ISO date string."""
+    return (datetime.date(1970, 1, 1) + datetime.timedelta(days=int(day))).isoformat()
+
+def encode(values, mapping):
+    """Replaces each value by its integer code from `mapping`."""
+    codes, uniques = pd.factorize(values)
+    return np.array([mapping[value] for value in uniques], dtype=np.int64)[codes]
+
+def lookup_ids(cursor, table_name, values):
+    """Returns {value: id} for a lookup table, adding any values not yet in it."""
+    id_col, name_col = LOOKUP_TABLES[table_name]
+    cursor.executemany(f"INSERT OR IGNORE INTO {table_name} ({name_col}) VALUES (?)",
+                       [(value,) for value in pd.unique(values)])
+    return dict(cursor.execute(f"SELECT {name_col}, {id_col} FROM {table_name}").fetchall())
+
+def encode_chunk(cursor, df):
+    """
+    Upserts the chunk's buildings, spaces and employees and adds the integer
+    codes used by the bookings table.
+    """
+    upsert_rows(cursor, 'buildings', BUILDING_COLUMNS, df.drop_duplicates('Building', keep='last'))
+    building_ids = dict(cursor.execute("SELECT Building, Building_ID FROM buildings").fetchall())
+    df['Building_ID'] = encode(df['Building'], building_ids)
+    for table_name, (id_col, name_col) in LOOKUP_TABLES.items():
+        df[id_col] = encode(df[name_col], lookup_ids(cursor, table_name, df[name_col]))
+
+    upsert_rows(cursor, 'spaces', SPACE_COLUMNS, df.drop_duplicates('Space_ID', keep='last'))
+    upsert_rows(cursor, 'employees', EMPLOYEE_COLUMNS, df.drop_duplicates('Employee_ID', keep='last'))
+    return df
+
+def insert_rows(cursor, table, columns, df, conflict=''):
+    """Inserts the given DataFrame columns with a single executemany call."""
+    placeholders = ', '.join('?' for _ in columns)
+    sql = f"INSERT {conflict} INTO {table} ({', '.join(columns)}) VALUES ({placeholders})"
+    # tolist() yields native Python values, which sqlite3 binds directly.
+    cursor.executemany(sql, zip(*(df[col].tolist() for col in columns)))
+
+def upsert_rows(cursor, table, columns, df):
+    """Inserts new rows and updates existing ones, keyed on the first column."""
+    placeholders = ', '.join('?' for _ in columns)
+    updates = ', '.join(f"{col} = excluded.{col}" for col in columns[1:])
+    sql = (f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({placeholders}) "
+           f"ON CONFLICT ({columns[0]}) DO UPDATE SET {updates}")
+    cursor.executemany(sql, zip(*(df[col].tolist() for col in columns)))
+
+# --- Incremental Loading ---
+
+def file_checksum(source):
+    """SHA-256 of the source file, or of every file in a Parquet dataset."""
+    digest = hashlib.sha256()
+    if os.path.isdir(source):
+        paths = sorted(os.path.join(root, name) for root, _, names in os.walk(source) for name in names)
+    else:
+        paths = [source]
+    for path in paths:
+        digest.update(os.path.relpath(path, source).encode())
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                digest.update(block)
+    return digest.hexdigest()
+
+def already_loaded(cursor, checksum):
+    """Returns the manifest row of an earlier load of the same file, if any."""
+    return cursor.execute(
+        "SELECT File, Loaded_At FROM load_manifest WHERE Checksum = ?", (checksum,)
+    ).fetchone()
+
+def high_water_mark(cursor):
+    """Latest booking date already loaded (None for an empty database)."""
+    return cursor.execute("SELECT MAX(Max_Date) FROM load_manifest").fetchone()[0] \
+        or cursor.execute("SELECT date(MAX(Day) * 86400, 'unixepoch') FROM bookings").fetchone()[0]
+
+def record_load(cursor, source, checksum, mode, row_count, rows_loaded, min_date, max_date):
+    """Adds an entry to the load manifest."""
+    cursor.execute(
+        "INSERT INTO load_manifest (File, Checksum, Load_Mode, Row_Count, Rows_Loaded, Min_Date, Max_Date, Loaded_At) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+        (os.path.abspath(source), checksum, mode, row_count, rows_loaded, min_date, max_date,
+         datetime.datetime.now().isoformat(timespec='seconds'))
+    )
+
+def read_metadata(cursor, key, default=None):
+    """Returns one db_metadata value, or default if it is not set."""
+    try:
+        row = cursor.execute("SELECT Value FROM db_metadata WHERE Key = ?", (key,)).fetchone()
+    except sqlite3.OperationalError:
+        return default
+    return row[0] if row else default
+
+def write_metadata(cursor, key, value):
+    """Sets one db_metadata value."""
+    cursor.execute(
+        "INSERT INTO db_metadata (Key, Value) VALUES (?, ?) "
+        "ON CONFLICT (Key) DO UPDATE SET Value = excluded.Value", (key, value)
+    )
+
+def read_generation(cursor):
+    """Returns the data generation of the database, or 0 if it has none."""
+    return int(read_metadata(cursor, 'generation', 0))
+
+def write_generation(cursor, generation):
+    """Records a new data generation; readers compare it with the one they cached."""
+    write_metadata(cursor, 'generation', generation)
+
+# --- Staging and Publishing ---
+# Loads never write to the database the dashboard reads. Each load builds a
+# staging file next to it (`<db>.staging`): empty for a full load, a copy of
+# the live database for the incremental modes. The staging file is checked
+# (foreign keys, booking counts against the rows loaded, rollups against the
+# bookings, all over the days just loaded; SQLite's quick_check too for a full
+# load) and only then renamed over the live file with os.replace, which is
+# atomic. A failed load or check leaves the live database untouched.
+#
+# Only one load per database may run at a time, since they would share the
+# staging file: each load holds `<db>.lock`, created with O_CREAT | O_EXCL,
+# and a second load fails immediately instead of deleting the first one's
+# staging file. A load that was killed leaves the lock behind; it names the
+# process that took it, and can be deleted once that process is gone.
+#
+# The copy is the price of that guarantee: an incremental load still reads and
+# writes the whole file once, which grows with the history. It is a plain
+# sequential file copy (published files are never modified in place, so the
+# bytes are a consistent snapshot), several times faster than the backup API.
+#
+# Readers with the old file open keep a consistent view of it until they
+# close their connection; the dashboard's pool notices the new file on its
+# next checkout (see db_pool.py) and the bumped generation invalidates its
+# caches, so loads can run while the dashboard is in use.
+
+STAGING_SUFFIX = '.staging'
+LOCK_SUFFIX = '.lock'
+SIDE_FILE_SUFFIXES = ['-wal', '-shm', '-journal']
+
+def staging_path(db_file):
+    return db_file + STAGING_SUFFIX
+
+def acquire_load_lock(db_file):
+    """Creates the load lock of db_file; raises FileExistsError if another load holds it."""
+    lock_file = db_file + LOCK_SUFFIX
+    fd = os.open(lock_file, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o644)
+    with os.fdopen(fd, 'w') as f:
+        f.write(f"{os.getpid()} {datetime.datetime.now().isoformat(timespec='seconds')}\n")
+    return lock_file
+
+def read_load_lock(lock_file):
+    """The '<pid> <start time>' written by the load holding the lock, or '' if unreadable."""
+    try:
+        with open(lock_file) as f:
+            return f.read().strip()
+    except OSError:
+        return ''
+
+def remove_database_file(path):
+    """Removes a database file together with its WAL, shared-memory and journal files."""
+    for name in [path] + [path + suffix for suffix in SIDE_FILE_SUFFIXES]:
+        if os.path.exists(name):
+            os.remove(name)
+
+def read_live_metadata(db_file, key, default=None):
+    """One db_metadata value of the live database, read without writing to it."""
+    if not os.path.exists(db_file):
+        return default
+    conn = sqlite3.connect(database_uri(db_file), uri=True)
+    try:
+        return read_metadata(conn.cursor(), key, default)
+    finally:
+        conn.close()
+
+def prepare_staging(db_file, staging_file, mode):
+    """Starts a staging database: empty for a full load, a copy of the live one otherwise."""
+    remove_database_file(staging_file)
+    if mode == 'full' or not os.path.exists(db_file):
         return
+    if not any(os.path.exists(db_file + suffix) for suffix in SIDE_FILE_SUFFIXES):
+        # A published file is self-contained and only ever replaced, never
+        # written to, so copying its bytes copies a consistent snapshot.
+        shutil.copyfile(db_file, staging_file)
+        return
+    # A database with a WAL or journal next to it was written in place (e.g.
+    # by an older loader): let the backup API take a consistent snapshot.
+    live = sqlite3.connect(database_uri(db_file), uri=True)
+    staging = sqlite3.connect(staging_file)
+    try:
+        live.backup(staging)
+    finally:
+        staging.close()
+        live.close()
+
+def check_staging(cursor, loaded_days, full):
+    """
+    Returns a list of problems found in the staging database (empty if it can
+    be published). `loaded_days` maps each Day that was loaded to its number
+    of rows. Only that Day range is checked, so the cost follows the size of
+    the load rather than of the history; `full` adds SQLite's quick_check.
+    """
+    problems = []
+    if full:
+        result = cursor.execute("PRAGMA quick_check").fetchall()
+        if result != [('ok',)]:
+            problems.append(f"quick_check: {'; '.join(row[0] for row in result[:5])}")
+    violations = cursor.execute("PRAGMA foreign_key_check(spaces)").fetchall()
+    if violations:
+        problems.append(f"{len(violations):,} foreign key violation(s) in spaces")
+    if loaded_days:
+        min_day, max_day = min(loaded_days), max(loaded_days)
+        orphans = cursor.execute("""
+            SELECT COUNT(*) FROM bookings b
+            LEFT JOIN employees e ON e.Employee_ID = b.Employee_ID
+            LEFT JOIN spaces s ON s.Space_ID = b.Space_ID
+            WHERE b.Day BETWEEN ? AND ? AND (e.Employee_ID IS NULL OR s.Space_ID IS NULL)
+        """, (min_day, max_day)).fetchone()[0]
+        if orphans:
+            problems.append(f"{orphans:,} foreign key violation(s) in bookings")
+        day_counts = dict(cursor.execute(
+            "SELECT Day, COUNT(*) FROM bookings WHERE Day BETWEEN ? AND ? GROUP BY Day", (min_day, max_day)))
+        wrong_days = [day for day, rows in loaded_days.items() if day_counts.get(day, 0) != rows]
+        if wrong_days:
+            found = sum(day_counts.get(day, 0) for day in loaded_days)
+            problems.append(f"bookings has {found:,} rows for the {len(loaded_days)} loaded day(s), expected "
+                            f"{sum(loaded_days.values()):,} (first mismatch on {day_to_iso(min(wrong_days))})")
+        # Rollups are refreshed for the whole range, including days without new rows.
+        bookings = sum(day_counts.values())
+        rolled_up = cursor.execute("SELECT COALESCE(SUM(Bookings), 0) FROM booking_rollup WHERE Day BETWEEN ? AND ?",
+                                   (min_day, max_day)).fetchone()[0]
+        if rolled_up != bookings:
+            problems.append(f"booking_rollup covers {rolled_up:,} bookings from {day_to_iso(min_day)} to "
+                            f"{day_to_iso(max_day)}, the table has {bookings:,}")
+    if cursor.execute("SELECT 1 FROM bookings LIMIT 1").fetchone() is not None:
+        for table_name in ['buildings', 'spaces', 'employees', 'daily_presence', 'presence_bitmaps', 'intraday_peaks']:
+            if cursor.execute(f"SELECT 1 FROM {table_name} LIMIT 1").fetchone() is None:
+                problems.append(f"{table_name} is empty")
+    return problems
+
+def publish_database(staging_file, db_file):
+    """Atomically replaces the live database with the checked staging file."""
+    # Fold the WAL back into the file and switch to a rollback journal, so the
+    # published database is a single self-contained file that read-only
+    # connections can open without creating -wal/-shm files.
+    conn = sqlite3.connect(staging_file, isolation_level=None)
+    conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    conn.execute("PRAGMA journal_mode = DELETE")
+    conn.close()
+    with open(staging_file, 'rb') as f:
+        os.fsync(f.fileno())
+    os.replace(staging_file, db_file)
+    directory = os.open(os.path.dirname(os.path.abspath(db_file)), os.O_RDONLY)
+    try:
+        os.fsync(directory)  # Make the rename itself durable
+    finally:
+        os.close(directory)
+
+def populate_database(source=CSV_FILE, db_file=DB_FILE, chunksize=CHUNK_SIZE, mode='full', bucket_minutes=None):
+    """
+    Reads the raw CSV (or Parquet) data in chunks, normalizes it, and
+    populates the SQLite database tables.
 
-    print(f"1. Reading data from '{CSV_FILE}'...")
-    df = pd.read_csv(CSV_FILE)
-    df['Date'] = pd.to_datetime(df['Date']).dt.strftime('%Y-%m-%d')
+    Each chunk is inserted with executemany inside one explicit transaction;
+    the secondary indexes are only built once all rows are in. See LOAD_MODES
+    for how `mode` decides which bookings are written. `bucket_minutes` sets
+    the intraday peak bucket size; by default the database keeps its current
+    one (BUCKET_MINUTES for a new database).
 
+    The data is loaded into a staging file and published over `db_file` only
+    if it passes check_staging(); see "Staging and Publishing". Returns False
+    if the checks failed or another load of `db_file` is running.
+    """
+    if not os.path.exists(source):
+        print(f"Error: The file '{source}' was not found.")
+        print("Please run 'generate_data.py' first.")
+        return
+    try:
+        lock_file = acquire_load_lock(db_file)
+    except FileExistsError:
+        lock_file = db_file + LOCK_SUFFIX
+        print(f"Error: another load of '{db_file}' is running (lock file '{lock_file}': "
+              f"{read_load_lock(lock_file) or 'unreadable'}).")
+        print("If that process is no longer running, delete the lock file and try again.")
+        return False
+    try:
+        return run_load(source, db_file, chunksize, mode, bucket_minutes)
+    finally:
+        os.remove(lock_file)
 
+def run_load(source, db_file, chunksize, mode, bucket_minutes):
+    """The body of populate_database(), run while holding the load lock."""
     # --- Normalize and Insert Data ---
-    conn = sqlite3.connect(DB_FILE)
+    # A full load starts from an empty file; dropping the tables would leave
+    # their pages behind as free space. The generation carries over, so caches
+    # of the old file never mistake the rebuilt one for data they have seen.
+    staging_file = staging_path(db_file)
+    if mode != 'full':
+        print(f"0. Copying '{db_file}' to the staging database...")
+    prepare_staging(db_file, staging_file, mode)
+    conn = sqlite3.connect(staging_file, isolation_level=None)
     cursor = conn.cursor()
+    apply_pragmas(cursor, LOAD_PRAGMAS)
 
-    print("2. Creating database schema...")
-    create_database_schema(cursor)
+    print(f"1. Preparing database schema ({mode} load)...")
+    if mode != 'full':
+        check_schema(cursor)
+    create_database_schema(cursor, drop_existing=(mode == 'full'))
+    generation = int(read_live_metadata(db_file, 'generation', 0)) if mode == 'full' else read_generation(cursor)
+    stored_bucket_minutes = read_metadata(cursor, 'intraday_bucket_minutes')
+    if mode == 'full':
+        # A rebuild keeps the bucket size of the database it replaces.
+        stored_bucket_minutes = read_live_metadata(db_file, 'intraday_bucket_minutes')
+    bucket_minutes = bucket_minutes or stored_bucket_minutes or BUCKET_MINUTES
+    checksum = file_checksum(source)
+    if mode != 'full':
+        previous = already_loaded(cursor, checksum)
+        if previous:
+            print(f"'{source}' was already loaded on {previous[1]}; nothing to do.")
+            conn.close()
+            remove_database_file(staging_file)
+            return
+    after_date = high_water_mark(cursor) if mode == 'append' else None
+    if after_date:
+        print(f"   - High-water mark: only bookings after {after_date} will be loaded.")
+        after_day = to_day_numbers(pd.Series([after_date]))[0]
 
-    # Populate 'spaces' table
-    print("3. Populating 'spaces' table...")
-    spaces_df = df[['Space_ID', 'Region', 'Country', 'City', 'Building', 'Floor', 'Space_Type']].drop_duplicates()
-    spaces_df.to_sql('spaces', conn, if_exists='append', index=False)
+    print(f"2. Loading '{source}' in chunks of {chunksize:,} rows...")
+    load_start = time.perf_counter()
+    total_rows = 0
+    loaded_rows = 0
+    min_day, max_day = np.inf, -np.inf
+    loaded_days = {}
+    replaced_dates = set()
+    for chunk in iter_source_chunks(source, chunksize, after_date):
+        chunk = normalize_chunk(chunk)
+        total_rows += len(chunk)
+        if after_date:
+            chunk = chunk[chunk['Day'] > after_day]
+        if chunk.empty:
+            continue
+        min_day = min(min_day, chunk['Day'].min())
+        max_day = max(max_day, chunk['Day'].max())
 
-    # Populate 'employees' table
-    print("4. Populating 'employees' table...")
-    employees_df = df[['Employee_ID', 'Department']].drop_duplicates()
-    employees_df.to_sql('employees', conn, if_exists='append', index=False)
+        cursor.execute("BEGIN")
+        # Buildings, spaces and employees repeat across chunks and loads; upsert them.
+        chunk = encode_chunk(cursor, chunk)
+        if mode == 'replace':
+            new_days = set(chunk['Day'].unique().tolist()) - replaced_dates
+            cursor.executemany("DELETE FROM bookings WHERE Day = ?", [(d,) for d in sorted(new_days)])
+            replaced_dates |= new_days
+        insert_rows(cursor, 'bookings', BOOKING_COLUMNS, chunk)
+        cursor.execute("COMMIT")
 
-    # Populate 'bookings' table
-    print("5. Populating 'bookings' table...")
-    bookings_df = df[['Date', 'Time', 'Employee_ID', 'Space_ID', 'Activity_Type', 'Booking_Status']]
-    bookings_df.to_sql('bookings', conn, if_exists='append', index=False)
+        for day, rows in chunk['Day'].value_counts().items():
+            loaded_days[int(day)] = loaded_days.get(int(day), 0) + int(rows)
+        loaded_rows += len(chunk)
+        elapsed = time.perf_counter() - load_start
+        print(f"   - {loaded_rows:,} rows loaded ({loaded_rows / elapsed:,.0f} rows/sec)")
+    load_seconds = time.perf_counter() - load_start
+    if replaced_dates:
+        print(f"   - Replaced {len(replaced_dates)} date partition(s).")
+    min_date, max_date = (day_to_iso(min_day), day_to_iso(max_day)) if loaded_rows else (None, None)
+    record_load(cursor, source, checksum, mode, total_rows, loaded_rows, min_date, max_date)
+
+    print("3. Creating indexes...")
+    index_start = time.perf_counter()
+    create_indexes(cursor, full_analyze=(mode == 'full'))
+    index_seconds = time.perf_counter() - index_start
+
+    if loaded_rows:
+        print(f"4. Refreshing rollup tables for {day_to_iso(min_day)} to {day_to_iso(max_day)}...")
+        rollup_start = time.perf_counter()
+        refresh_rollups(cursor, int(min_day), int(max_day))
+        print(f"   - Done in {time.perf_counter() - rollup_start:.1f}s.")
+    rebucket = stored_bucket_minutes not in (None, bucket_minutes)
+    if rebucket:
+        # A new bucket size applies to the whole history, not just this load.
+        min_day, max_day = cursor.execute("SELECT MIN(Day), MAX(Day) FROM bookings").fetchone()
+        if min_day is None:
+            # No bookings to recompute; just record the new size.
+            write_metadata(cursor, 'intraday_bucket_minutes', bucket_minutes)
+    if (loaded_rows or rebucket) and min_day is not None:
+        print(f"   - Intraday peaks ({bucket_minutes}-minute buckets) for {day_to_iso(min_day)} to {day_to_iso(max_day)}...")
+        peaks_start = time.perf_counter()
+        refresh_intraday_peaks(cursor, int(min_day), int(max_day), bucket_minutes)
+        print(f"   - Done in {time.perf_counter() - peaks_start:.1f}s.")
+    # The dashboard's date bounds and location lists, published together with
+    # the new generation.
+    cursor.execute("BEGIN")
+    write_metadata(cursor, 'filter_domain', json.dumps(compute_filter_domain(cursor)))
+    write_generation(cursor, generation + 1)
+    cursor.execute("COMMIT")
 
     # --- Verification ---
-    print("6. Verifying inserted data...")
-    for table_name in ['spaces', 'employees', 'bookings']:
+    print("5. Verifying inserted data...")
+    for table_name in ['buildings', 'spaces', 'employees', 'bookings', 'booking_rollup', 'daily_presence',
+                       'presence_bitmaps', 'intraday_peaks']:
         count = cursor.execute(f"SELECT COUNT(*) FROM {table_name}").fetchone()[0]
         print(f"   - Found {count} records in '{table_name}'.")
+    print(f"   - Data generation is now {generation + 1}.")
 
-    conn.commit()
+    print("6. Checking the staging database...")
+    problems = check_staging(cursor, loaded_days, full=(mode == 'full'))
     conn.close()
+    if problems:
+        for problem in problems:
+            print(f"   - {problem}")
+        print(f"Error: the staging checks failed; '{db_file}' was left unchanged and the staging "
+              f"database kept at '{staging_file}' for inspection.")
+        return False
+    print(f"7. Publishing '{staging_file}' as '{db_file}'...")
+    publish_database(staging_file, db_file)
 
-    print(f"\nSuccessfully created and populated '{DB_FILE}'.")
+    total_seconds = load_seconds + index_seconds
+    print(f"\nSuccessfully populated '{db_file}'.")
+    print(f"Loaded {loaded_rows:,} of {total_rows:,} rows read in {total_seconds:.1f}s "
+          f"({loaded_rows / max(total_seconds, 1e-9):,.0f} rows/sec; indexing took {index_seconds:.1f}s).")
     print("Database ingestion complete.")
 
 
 if __name__ == '__main__':
-    populate_database()
-
+    parser = argparse.ArgumentParser(description="Load the simulated workspace data into SQLite.")
+    parser.add_argument('--input', default=CSV_FILE, help=f"Source CSV file or Parquet dataset (default: {CSV_FILE}).")
+    parser.add_argument('--db', default=DB_FILE, help=f"SQLite database file (default: {DB_FILE}).")
+    parser.add_argument('--chunksize', type=int, default=CHUNK_SIZE, help="Rows per chunk/transaction.")
+    parser.add_argument('--mode', choices=LOAD_MODES, default='full',
+                        help="full: rebuild; append: only bookings after the high-water mark; "
+                             "replace: replace the dates present in the input.")
+    parser.add_argument('--bucket-minutes', type=int, choices=[15, 30], default=None,
+                        help="Bucket size for the intraday peak concurrency table (default: keep the "
+                             f"database's current size, {BUCKET_MINUTES} for a new one).")
+    args = parser.parse_args()
+    published = populate_database(source=args.input, db_file=args.db, chunksize=args.chunksize, mode=args.mode,
+                                  bucket_minutes=args.bucket_minutes)
+    if published is False:
+        raise SystemExit(1)
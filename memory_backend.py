@@ -0,0 +1,157 @@
+
+
+import numpy as np
+import pandas as pd
+from kpi_engine import distinct_keys
+
+# --- In-Memory Columnar Backend ---
+# An alternative to the SQLite queries in kpi_engine.py: the booking columns
+# the KPIs need are read once into NumPy arrays (sorted by Day) and every
+# filter change is answered with array slices, boolean masks and bincounts.
+#
+# Text values stay dictionary-encoded exactly as in the database: bookings
+# hold integer Building/Space_Type/Status/Activity codes and the store keeps
+# the small dictionaries that decode them. A Country/City/Building filter is
+# evaluated once on the buildings dictionary and then applied to the bookings
+# as a lookup into a per-Building_ID boolean array.
+#
+# fetch_kpi_data() returns the same dataset as kpi_engine.fetch_kpi_data(),
+# except that multi-day distinct counts use (Day, Employee_ID) presence pairs
+# instead of the stored bitmaps, so kpi_engine.summarize_kpis() and
+# occupancy_trend() produce identical frames from either backend.
+
+BOOKING_COLUMNS = {
+    'Day': np.int32,
+    'Building_ID': np.int32,
+    'Space_Type_ID': np.int8,
+    'Employee_ID': np.int32,
+    'Status_ID': np.int8,
+    'Activity_Type_ID': np.int8,
+}
+FETCH_ROWS = 500_000
+
+def read_columns(conn, query, dtypes):
+    """Reads a query into one NumPy array per column, FETCH_ROWS rows at a time."""
+    cursor = conn.execute(query)
+    blocks = []
+    while True:
+        rows = cursor.fetchmany(FETCH_ROWS)
+        if not rows:
+            break
+        blocks.append(np.array(rows, dtype=np.int64).reshape(len(rows), len(dtypes)))
+    data = np.concatenate(blocks) if blocks else np.empty((0, len(dtypes)), dtype=np.int64)
+    return {col: data[:, i].astype(dtype) for i, (col, dtype) in enumerate(dtypes.items())}
+
+def read_dictionary(conn, table, id_col, name_col):
+    """Returns an object array mapping each ID of a lookup table to its text value."""
+    rows = conn.execute(f"SELECT {id_col}, {name_col} FROM {table}").fetchall()
+    names = np.full(max((row[0] for row in rows), default=0) + 1, None, dtype=object)
+    for row_id, name in rows:
+        names[row_id] = name
+    return names
+
+def lookup_code(names, value):
+    """Returns the code of a dictionary value, or -1 if it is missing."""
+    matches = np.flatnonzero(names == value)
+    return int(matches[0]) if len(matches) else -1
+
+def load_store(conn):
+    """Reads the booking columns and dictionaries into memory."""
+    columns = read_columns(conn, f"SELECT {', '.join(BOOKING_COLUMNS)} FROM bookings", BOOKING_COLUMNS)
+    order = np.argsort(columns['Day'], kind='stable')
+    columns = {col: values[order] for col, values in columns.items()}
+
+    buildings = pd.read_sql_query(
+        "SELECT Building_ID, Country, City, Building FROM buildings", conn, index_col='Building_ID'
+    )
+    n_buildings = int(buildings.index.max()) + 1 if not buildings.empty else 0
+    space_buildings = np.array([row[0] for row in conn.execute("SELECT Building_ID FROM spaces")], dtype=np.int64)
+    dictionaries = {
+        'Space_Type': read_dictionary(conn, 'space_types', 'Space_Type_ID', 'Space_Type'),
+        'Booking_Status': read_dictionary(conn, 'booking_statuses', 'Status_ID', 'Booking_Status'),
+        'Activity_Type': read_dictionary(conn, 'activity_types', 'Activity_Type_ID', 'Activity_Type'),
+    }
+    return {
+        'columns': columns,
+        'buildings': buildings,
+        'dictionaries': dictionaries,
+        'spaces_per_building': np.bincount(space_buildings, minlength=n_buildings),
+        'confirmed_id': lookup_code(dictionaries['Booking_Status'], 'Confirmed'),
+        'no_show_id': lookup_code(dictionaries['Booking_Status'], 'No-Show'),
+        'check_in_id': lookup_code(dictionaries['Activity_Type'], 'Check-in'),
+    }
+
+def building_mask(store, filters):
+    """Boolean array indexed by Building_ID for the selected location, or None for all."""
+    buildings = store['buildings']
+    if filters['building']:
+        selected = buildings['Building'] == filters['building']
+    elif filters['city']:
+        selected = (buildings['Country'] == filters['country']) & (buildings['City'] == filters['city'])
+    elif filters['country']:
+        selected = buildings['Country'] == filters['country']
+    else:
+        return None
+    mask = np.zeros(len(store['spaces_per_building']), dtype=bool)
+    mask[buildings.index[selected.to_numpy()]] = True
+    return mask
+
+def fetch_kpi_data(store, filters):
+    """Evaluates one filter selection; see kpi_engine.fetch_kpi_data()."""
+    columns = store['columns']
+    start_day, end_day = filters['start_day'], filters['end_day']
+    lo, hi = np.searchsorted(columns['Day'], [start_day, end_day + 1])
+    selected = {col: values[lo:hi] for col, values in columns.items()}
+    mask = building_mask(store, filters)
+    if mask is not None:
+        in_location = mask[selected['Building_ID']]
+        selected = {col: values[in_location] for col, values in selected.items()}
+        total_spaces = int(store['spaces_per_building'][mask].sum())
+    else:
+        total_spaces = int(store['spaces_per_building'].sum())
+
+    space_type_names = store['dictionaries']['Space_Type']
+    n_types = len(space_type_names)
+    n_days = max(end_day - start_day + 1, 0)
+    day = selected['Day'].astype(np.int64) - start_day
+    confirmed = selected['Status_ID'] == store['confirmed_id']
+    no_show = selected['Status_ID'] == store['no_show_id']
+    check_in = confirmed & (selected['Activity_Type_ID'] == store['check_in_id'])
+
+    # One bin per (day, space type), in the ORDER BY Day, Space_Type_ID order
+    # of the SQL path.
+    key = day * n_types + selected['Space_Type_ID']
+    size = n_days * n_types
+    bookings = np.bincount(key, minlength=size)
+    rows = np.flatnonzero(bookings)
+
+    # Distinct (Day, Employee_ID) pairs among the confirmed bookings.
+    n_employees = int(selected['Employee_ID'].max()) + 1 if len(day) else 1
+    pairs = distinct_keys(day[confirmed] * n_employees + selected['Employee_ID'][confirmed], n_days * n_employees)
+    presence_days, presence_employees = pairs // n_employees, pairs % n_employees
+    employees_per_day = np.bincount(presence_days, minlength=n_days).astype(float)
+    employees_per_day[employees_per_day == 0] = np.nan
+
+    daily = pd.DataFrame({
+        'Day': rows // n_types + start_day,
+        'Space_Type': space_type_names[rows % n_types],
+        'Bookings': bookings[rows],
+        'Confirmed': np.bincount(key[confirmed], minlength=size)[rows],
+        'No_Shows': np.bincount(key[no_show], minlength=size)[rows],
+        'Check_Ins': np.bincount(key[check_in], minlength=size)[rows],
+        'Employees': employees_per_day[rows // n_types],
+    })
+    return {
+        'daily': daily,
+        'presence': (presence_days + start_day, presence_employees),
+        'total_spaces': total_spaces,
+    }
+
+def memory_usage(store):
+    """Returns {column or dictionary: bytes held in memory}."""
+    usage = {col: int(values.nbytes) for col, values in store['columns'].items()}
+    usage['buildings'] = int(store['buildings'].memory_usage(deep=True).sum())
+    for name, values in store['dictionaries'].items():
+        usage[name] = int(pd.Series(values).memory_usage(deep=True))
+    usage['spaces_per_building'] = int(store['spaces_per_building'].nbytes)
+    return usage
@@ -0,0 +1,50 @@
+
+
+import zlib
+import numpy as np
+
+# --- Employee Presence Bitmaps ---
+# For every (Day, Building) the loader stores which employees had a confirmed
+# booking as a bitmap: bit i is set when Employee_ID i was present. Distinct
+# employee counts over any date range and set of buildings are then exact
+# bitmap unions (bitwise OR) followed by a popcount, instead of a
+# COUNT(DISTINCT ...) over the raw bookings.
+#
+# Bitmaps are packed 8 employees per byte and zlib-compressed. Their length
+# follows the highest Employee_ID present, so bitmaps of different lengths are
+# OR-ed into an accumulator that grows as needed.
+
+def encode_bitmap(employee_ids):
+    """Packs an array of employee IDs into a compressed presence bitmap."""
+    employee_ids = np.asarray(employee_ids, dtype=np.int64)
+    bits = np.zeros(int(employee_ids.max()) + 1 if len(employee_ids) else 0, dtype=bool)
+    bits[employee_ids] = True
+    return zlib.compress(np.packbits(bits).tobytes())
+
+def decode_bitmap(blob):
+    """Returns the packed (uint8) form of a stored bitmap."""
+    return np.frombuffer(zlib.decompress(blob), dtype=np.uint8)
+
+def bitmap_employee_ids(blob):
+    """Returns the employee IDs set in a stored bitmap."""
+    return np.flatnonzero(np.unpackbits(decode_bitmap(blob)))
+
+def union_counts(rows):
+    """
+    Takes an iterable of (key, bitmap) pairs and returns {key: number of
+    distinct employees across all bitmaps with that key}.
+
+    Rows are consumed one at a time, so memory is one accumulator per key no
+    matter how many bitmaps are read.
+    """
+    accumulators = {}
+    for key, blob in rows:
+        packed = decode_bitmap(blob)
+        acc = accumulators.get(key)
+        if acc is None or len(acc) < len(packed):
+            grown = np.zeros(len(packed), dtype=np.uint8)
+            if acc is not None:
+                grown[:len(acc)] = acc
+            acc = accumulators[key] = grown
+        acc[:len(packed)] |= packed
+    return {key: int(np.bitwise_count(acc).sum()) for key, acc in accumulators.items()}
@@ -0,0 +1,110 @@
+
+
+import collections
+import sys
+import threading
+import pandas as pd
+
+# --- Generation-Aware Query Cache ---
+# Every load_to_sqlite.py run bumps the data generation stored in the
+# db_metadata table. Cached results are tagged with the generation they were
+# computed from and are reused for as long as it is current: there is no TTL,
+# and the first lookup that sees a newer generation drops everything older.
+# A lookup that still sees an older generation is computed but not cached.
+#
+# Keys are a query template (or function name) plus its bound parameters, so
+# the same logical query always lands on the same entry whatever the filter
+# values look like in the SQL. Memory is bounded by an approximate byte size,
+# evicting the least recently used entries first.
+#
+# Cached values are shared between sessions and must not be modified.
+
+MAX_BYTES = 256 * 1024 * 1024
+GENERATION_QUERY = "SELECT Value FROM db_metadata WHERE Key = 'generation'"
+
+def read_generation(conn):
+    """Returns the data generation written by the loader (0 for older databases)."""
+    try:
+        row = conn.execute(GENERATION_QUERY).fetchone()
+    except Exception:
+        return 0
+    return int(row[0]) if row else 0
+
+def create_cache(max_bytes=MAX_BYTES):
+    """Creates an empty cache bounded to roughly max_bytes of results."""
+    return {
+        'max_bytes': max_bytes,
+        'entries': collections.OrderedDict(),
+        'lock': threading.Lock(),
+        'generation': None,
+        'stats': {'hits': 0, 'misses': 0, 'evictions': 0, 'invalidations': 0, 'bytes': 0},
+    }
+
+def cache_key(template, params=()):
+    """Normalizes a query template and its parameters into a hashable key."""
+    if isinstance(params, dict):
+        params = tuple(sorted(params.items()))
+    return (' '.join(template.split()), tuple(params))
+
+def result_size(value):
+    """Approximate memory held by a cached result, in bytes."""
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(deep=True).sum())
+    if isinstance(value, dict):
+        return sum(result_size(v) for v in value.values())
+    if isinstance(value, (list, tuple)):
+        return sys.getsizeof(value) + sum(result_size(v) for v in value)
+    return sys.getsizeof(value)
+
+def set_generation(cache, generation):
+    """
+    Moves the cache to a newer generation, dropping every entry computed from
+    an older one. Call with the lock held.
+    """
+    if cache['generation'] is None or generation > cache['generation']:
+        if cache['entries']:
+            cache['stats']['invalidations'] += 1
+        cache['entries'].clear()
+        cache['stats']['bytes'] = 0
+        cache['generation'] = generation
+
+def get_or_compute(cache, generation, key, compute):
+    """
+    Returns the cached result for key at this generation, calling compute() and
+    storing its result on a miss.
+    """
+    stats = cache['stats']
+    with cache['lock']:
+        set_generation(cache, generation)
+        if generation == cache['generation'] and key in cache['entries']:
+            cache['entries'].move_to_end(key)
+            stats['hits'] += 1
+            return cache['entries'][key][0]
+        stats['misses'] += 1
+
+    value = compute()
+    size = result_size(value)
+    with cache['lock']:
+        # A newer generation may have been seen while computing; only keep
+        # the result if it still describes the current data.
+        if cache['generation'] != generation or size > cache['max_bytes']:
+            return value
+        if key in cache['entries']:
+            stats['bytes'] -= cache['entries'].pop(key)[1]
+        cache['entries'][key] = (value, size)
+        stats['bytes'] += size
+        while stats['bytes'] > cache['max_bytes']:
+            _, (_, evicted_size) = cache['entries'].popitem(last=False)
+            stats['bytes'] -= evicted_size
+            stats['evictions'] += 1
+    return value
+
+def cache_stats(cache):
+    """Returns a snapshot of the cache counters."""
+    with cache['lock']:
+        stats = dict(cache['stats'])
+        stats['entries'] = len(cache['entries'])
+        stats['generation'] = cache['generation']
+    lookups = stats['hits'] + stats['misses']
+    stats['hit_rate'] = stats['hits'] / lookups if lookups else 0.0
+    return stats
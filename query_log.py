@@ -0,0 +1,167 @@
+
+
+import collections
+import datetime
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import pandas as pd
+
+# --- Query Instrumentation ---
+# Every dashboard query is recorded with its duration, the rows it returned,
+# whether the query cache answered it and, for queries that ran, its
+# EXPLAIN QUERY PLAN with full-table scans flagged. Records are kept in a
+# bounded in-memory log shared by all sessions (for the debug panel). Queries
+# slower than SLOW_QUERY_MS are written as warnings, one JSON object per line,
+# to the 'workspace_analytics.queries' logger together with their parameters
+# and filter context; every query's full record is only written on request.
+#
+# Settings come from the environment:
+# - SLOW_QUERY_MS:   slow-query threshold in milliseconds (default 500).
+# - QUERY_LOG_LEVEL: WARNING (default) logs only the slow queries, INFO every
+#                    query's full record including its plan.
+# - QUERY_LOG_FILE:  append the JSON lines to this file instead of stderr.
+
+SLOW_QUERY_MS = float(os.environ.get('SLOW_QUERY_MS', 500))
+QUERY_LOG_LEVEL = os.environ.get('QUERY_LOG_LEVEL', 'WARNING')
+QUERY_LOG_FILE = os.environ.get('QUERY_LOG_FILE')
+MAX_ENTRIES = 500
+LOGGER_NAME = 'workspace_analytics.queries'
+
+logger = logging.getLogger(LOGGER_NAME)
+
+def configure_logging(log_file=QUERY_LOG_FILE, level=QUERY_LOG_LEVEL):
+    """Sends the query log to a file or stderr as bare JSON lines (once per process)."""
+    if logger.handlers:
+        return logger
+    handler = logging.FileHandler(log_file) if log_file else logging.StreamHandler()
+    handler.setFormatter(logging.Formatter('%(message)s'))
+    logger.addHandler(handler)
+    logger.setLevel(level)
+    logger.propagate = False
+    return logger
+
+def create_query_log(max_entries=MAX_ENTRIES, slow_ms=SLOW_QUERY_MS):
+    """Creates an empty log keeping the last max_entries query records."""
+    return {
+        'entries': collections.deque(maxlen=max_entries),
+        'plans': {},  # Last plan per SQL text
+        'slow_ms': slow_ms,
+        'lock': threading.Lock(),
+        'stats': {'queries': 0, 'hits': 0, 'misses': 0, 'slow': 0, 'full_scans': 0},
+    }
+
+def explain(conn, query, params=()):
+    """Returns the detail lines of the query's EXPLAIN QUERY PLAN."""
+    try:
+        return [row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {query}", params)]
+    except sqlite3.Error as e:
+        return [f"EXPLAIN failed: {e}"]
+
+def full_scans(plan):
+    """
+    Plan lines that read a whole table without an index. Scans of CTEs and
+    subqueries SQLite materialized itself ('SCAN rollup') are not flagged.
+    """
+    materialized = {line.split(' ', 1)[1] for line in plan if line.startswith(('MATERIALIZE ', 'CO-ROUTINE '))}
+    return [
+        line for line in plan
+        if line.startswith('SCAN ') and ' USING ' not in line and line.split()[1] not in materialized
+    ]
+
+def result_rows(result):
+    """Number of rows in a query result (a DataFrame, a fetchall() list or a scalar)."""
+    if result is None:
+        return 0
+    if isinstance(result, (pd.DataFrame, list, tuple)):
+        return len(result)
+    return 1
+
+def record(log, name, query, params, cache, duration_ms, rows, plan=None, context=None):
+    """Adds one query record to the log and writes it to the query logger."""
+    sql = ' '.join(query.split())
+    if plan is None:
+        # Cache hits did not run; show the plan from the last time this SQL did.
+        plan = log['plans'].get(sql, [])
+    scans = full_scans(plan)
+    entry = {
+        'event': 'query',
+        'time': datetime.datetime.now().isoformat(timespec='milliseconds'),
+        'name': name,
+        'cache': cache,
+        'duration_ms': round(duration_ms, 3),
+        'rows': rows,
+        'full_scans': scans,
+        'plan': plan,
+        'sql': sql,
+        'params': params,
+        'context': context,
+        'thread': threading.current_thread().name,
+    }
+    slow = cache == 'miss' and duration_ms >= log['slow_ms']
+    stats = log['stats']
+    with log['lock']:
+        log['entries'].append(entry)
+        log['plans'][sql] = plan
+        stats['queries'] += 1
+        stats['hits' if cache == 'hit' else 'misses'] += 1
+        stats['slow'] += slow
+        stats['full_scans'] += bool(scans)
+    logger.info(json.dumps(entry, default=str))
+    if slow:
+        logger.warning(json.dumps({
+            'event': 'slow_query',
+            'name': name,
+            'duration_ms': entry['duration_ms'],
+            'threshold_ms': log['slow_ms'],
+            'sql': entry['sql'],
+            'params': params,
+            'context': context,
+        }, default=str))
+    return entry
+
+def profile(log, conn, name, query, params, run, context=None):
+    """
+    Runs run(conn) as a cache miss, records its time, rows and query plan and
+    returns its result. The plan is read after the query on the same connection.
+    """
+    started = time.perf_counter()
+    result = run(conn)
+    duration_ms = (time.perf_counter() - started) * 1000
+    record(log, name, query, params, 'miss', duration_ms, result_rows(result), explain(conn, query, params), context)
+    return result
+
+def query_summary(log):
+    """Per-query totals over the records still in the log, slowest first."""
+    with log['lock']:
+        entries = list(log['entries'])
+    if not entries:
+        return pd.DataFrame(columns=['Query', 'Calls', 'Hit_Rate', 'Median_ms', 'Max_ms', 'Rows', 'Full_Scan'])
+    df = pd.DataFrame(entries)
+    df['hit'] = df['cache'] == 'hit'
+    df['full_scan'] = df['full_scans'].map(bool)
+    summary = df.groupby('name').agg(
+        Calls=('name', 'size'),
+        Hit_Rate=('hit', 'mean'),
+        Median_ms=('duration_ms', 'median'),
+        Max_ms=('duration_ms', 'max'),
+        Rows=('rows', 'last'),
+        Full_Scan=('full_scan', 'any'),
+    )
+    return summary.sort_values('Max_ms', ascending=False).rename_axis('Query').reset_index()
+
+def recent_entries(log, limit=50):
+    """The most recent records, newest first."""
+    with log['lock']:
+        return list(log['entries'])[::-1][:limit]
+
+def log_stats(log):
+    """Returns a snapshot of the log counters."""
+    with log['lock']:
+        stats = dict(log['stats'])
+    stats['slow_ms'] = log['slow_ms']
+    stats['hit_rate'] = stats['hits'] / stats['queries'] if stats['queries'] else 0.0
+    return stats
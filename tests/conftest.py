@@ -0,0 +1,37 @@
+
+
+import datetime
+import os
+import sys
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import generate_data
+import load_to_sqlite
+
+# --- Test Databases ---
+# Small seeded datasets run through the real generator and loader, so tests
+# exercise the same schema, rollups and metadata the dashboard reads.
+
+SEED = 7
+EMPLOYEES = 300
+
+def build_database(directory, first_date, last_date, n_employees=EMPLOYEES, seed=SEED):
+    """Generates and loads a small dataset into directory; returns the database path."""
+    source = os.path.join(directory, 'raw.csv')
+    db_file = os.path.join(directory, 'workspace_analytics.db')
+    generate_data.generate_raw_data(seed=seed, output_path=source, n_employees=n_employees,
+                                    first_date=first_date, last_date=last_date)
+    load_to_sqlite.populate_database(source, db_file)
+    return db_file
+
+@pytest.fixture(scope='session')
+def tiny_db(tmp_path_factory):
+    """About three months of bookings for a few hundred employees."""
+    return build_database(str(tmp_path_factory.mktemp('tiny')), datetime.date(2025, 1, 1), datetime.date(2025, 3, 31))
+
+@pytest.fixture(scope='session')
+def short_db(tmp_path_factory):
+    """Two weeks of bookings: shorter than the dashboard's default 30-day window."""
+    return build_database(str(tmp_path_factory.mktemp('short')), datetime.date(2025, 3, 3), datetime.date(2025, 3, 16))
@@ -0,0 +1,45 @@
+
+
+import os
+import shutil
+import threading
+import time
+import db_pool
+
+# A load publishes a new file while every pooled connection is checked out:
+# the connection returned afterwards is closed, and a caller already waiting
+# must open a new one in its place instead of timing out.
+
+def test_waiter_opens_new_connection_after_publish(tiny_db, tmp_path, monkeypatch):
+    monkeypatch.setattr(db_pool, 'CHECKOUT_TIMEOUT', 5)
+    db_file = str(tmp_path / 'live.db')
+    shutil.copyfile(tiny_db, db_file)
+    pool = db_pool.create_pool(db_file, size=1)
+    held = db_pool.acquire(pool)
+    result = {}
+
+    def waiter():
+        started = time.perf_counter()
+        try:
+            with db_pool.connection(pool) as conn:
+                result['bookings'] = conn.execute("SELECT COUNT(*) FROM bookings").fetchone()[0]
+        except Exception as e:
+            result['error'] = e
+        result['seconds'] = time.perf_counter() - started
+
+    thread = threading.Thread(target=waiter)
+    thread.start()
+    time.sleep(0.2)  # Let the waiter block on the full pool
+
+    shutil.copyfile(tiny_db, db_file + '.new')
+    os.replace(db_file + '.new', db_file)
+    db_pool.refresh(pool)  # As the next checkout in any other session would
+    db_pool.release(pool, held)
+    thread.join(timeout=10)
+
+    assert 'error' not in result
+    assert result['bookings'] > 0
+    assert result['seconds'] < 2
+    stats = db_pool.pool_stats(pool)
+    assert stats['connections'] == 1 and stats['reopened'] == 1 and stats['waits'] == 1
+    db_pool.close_pool(pool)
@@ -0,0 +1,10 @@
+
+
+import generate_data
+
+def test_inventory_helpers_work_without_a_generator():
+    employees = generate_data.create_employee_data(50, generate_data.DEPARTMENTS)
+    spaces = generate_data.create_space_inventory()
+    employees = generate_data.assign_home_buildings(employees, spaces)
+    assert len(employees) == 50 and len(spaces) > 0
+    assert employees['Home_Building'].isin(spaces['Building']).all()
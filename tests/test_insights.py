@@ -0,0 +1,106 @@
+
+
+import concurrent.futures
+import os
+import threading
+import pytest
+import insights
+
+SUMMARY = {'kpis': {'peak_daily_occupancy': 120, 'no_show_rate_percent': 12.5}}
+
+def counting_client(name='stub', release=None, fail=False):
+    """A stub client that counts its calls, optionally blocking until `release` is set or failing."""
+    calls = []
+    stub = insights.stub_client(name)
+    def generate(prompt):
+        calls.append(prompt)
+        if release is not None:
+            release.wait(timeout=10)
+        if fail:
+            raise RuntimeError("model unavailable")
+        return stub['generate'](prompt)
+    return {'name': name, 'generate': generate}, calls
+
+def wait_for(service, key):
+    with service['lock']:
+        future = service['pending'].get(key)
+    if future is not None:
+        concurrent.futures.wait([future], timeout=10)
+
+@pytest.fixture
+def service(tmp_path):
+    service = insights.create_insight_service('stub', cache_dir=str(tmp_path / 'cache'))
+    yield service
+    service['executor'].shutdown(wait=True)
+
+def test_concurrent_identical_requests_call_the_model_once(service):
+    release = threading.Event()
+    client, calls = counting_client(release=release)
+    n_requests = 8
+    with concurrent.futures.ThreadPoolExecutor(max_workers=n_requests) as pool:
+        keys = list(pool.map(lambda _: insights.request_insight(service, client, SUMMARY), range(n_requests)))
+    assert insights.insight_status(service, keys[0]) == ('pending', None)
+    release.set()
+    wait_for(service, keys[0])
+
+    assert len(set(keys)) == 1
+    assert len(calls) == 1
+    stats = insights.insight_stats(service)
+    assert stats['coalesced'] == n_requests - 1
+    assert stats['generated'] == 1
+    status, text = insights.insight_status(service, keys[0])
+    assert status == 'ready' and text.startswith('**Insight 1:**')
+
+def test_cached_insight_is_not_generated_again(service):
+    client, calls = counting_client()
+    key = insights.request_insight(service, client, SUMMARY)
+    wait_for(service, key)
+    assert insights.request_insight(service, client, dict(SUMMARY)) == key
+    assert len(calls) == 1
+    assert insights.insight_stats(service)['cache_hits'] == 1
+    assert insights.insight_status(service, key)[0] == 'ready'
+
+def test_cache_key_depends_on_model_and_summary():
+    other = {'kpis': dict(SUMMARY['kpis'], peak_daily_occupancy=121)}
+    assert insights.summary_key(SUMMARY, 'stub') == insights.summary_key(dict(SUMMARY), 'stub')
+    assert insights.summary_key(SUMMARY, 'stub') != insights.summary_key(SUMMARY, 'gemini-pro')
+    assert insights.summary_key(SUMMARY, 'stub') != insights.summary_key(other, 'stub')
+
+def test_eviction_removes_least_recently_used(tmp_path):
+    cache_dir = str(tmp_path)
+    for i, key in enumerate(['old', 'middle', 'new']):
+        insights.write_cached(cache_dir, key, 'stub', 'x' * 1000)
+        os.utime(insights.cache_path(cache_dir, key), (1000 + i, 1000 + i))
+    insights.read_cached(cache_dir, 'old')  # Reading marks it as recently used
+    total = sum(os.path.getsize(insights.cache_path(cache_dir, key)) for key in ['old', 'middle', 'new'])
+    assert insights.evict(cache_dir, total - 1) == 1
+    assert insights.read_cached(cache_dir, 'middle') is None
+    assert insights.read_cached(cache_dir, 'old') is not None
+    assert insights.read_cached(cache_dir, 'new') is not None
+
+def test_service_keeps_cache_within_budget(tmp_path):
+    service = insights.create_insight_service('stub', cache_dir=str(tmp_path), max_bytes=1)
+    client, _ = counting_client()
+    try:
+        key = insights.request_insight(service, client, SUMMARY)
+        wait_for(service, key)
+    finally:
+        service['executor'].shutdown(wait=True)
+    assert insights.insight_stats(service)['evictions'] == 1
+    assert insights.insight_status(service, key) == ('missing', None)
+
+def test_failed_generation_is_reported_and_not_cached(service):
+    client, calls = counting_client(fail=True)
+    key = insights.request_insight(service, client, SUMMARY)
+    wait_for(service, key)
+    status, message = insights.insight_status(service, key)
+    assert status == 'error' and 'model unavailable' in message
+    assert not os.path.exists(insights.cache_path(service['cache_dir'], key))
+    assert insights.insight_stats(service)['errors'] == 1
+
+    # A later request retries instead of serving the error.
+    retry_client, retry_calls = counting_client()
+    insights.request_insight(service, retry_client, SUMMARY)
+    wait_for(service, key)
+    assert len(retry_calls) == 1
+    assert insights.insight_status(service, key)[0] == 'ready'
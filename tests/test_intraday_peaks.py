@@ -0,0 +1,46 @@
+
+
+import numpy as np
+import pandas as pd
+import pytest
+import intraday_peaks
+
+def brute_force_peaks(group_codes, n_groups, start_seconds, dwell, bucket_minutes):
+    """Occupancy of every bucket counted booking by booking."""
+    bucket_seconds = bucket_minutes * 60
+    n_buckets = intraday_peaks.SECONDS_PER_DAY // bucket_seconds
+    occupancy = np.zeros((n_groups, n_buckets), dtype=np.int64)
+    for group, start, length in zip(group_codes, start_seconds, dwell):
+        end = min(start + max(length, 1) - 1, intraday_peaks.SECONDS_PER_DAY - 1)
+        occupancy[group, start // bucket_seconds:end // bucket_seconds + 1] += 1
+    peak_bucket = occupancy.argmax(axis=1)
+    return occupancy[np.arange(n_groups), peak_bucket], peak_bucket * bucket_seconds
+
+@pytest.mark.parametrize('bucket_minutes', [15, 30])
+@pytest.mark.parametrize('seed', range(5))
+def test_sweep_matches_brute_force(seed, bucket_minutes):
+    rng = np.random.default_rng(seed)
+    n_groups = 40
+    group_codes = np.r_[np.arange(n_groups), rng.integers(0, n_groups, 400)]
+    start_seconds = rng.integers(0, intraday_peaks.SECONDS_PER_DAY, len(group_codes))
+    dwell = rng.choice([0, 60, 3600, 4 * 3600, 25 * 3600], len(group_codes))
+    peak, peak_time = intraday_peaks.sweep_peaks(group_codes, n_groups, start_seconds, dwell, bucket_minutes)
+    expected_peak, expected_time = brute_force_peaks(group_codes, n_groups, start_seconds, dwell, bucket_minutes)
+    np.testing.assert_array_equal(peak, expected_peak)
+    np.testing.assert_array_equal(peak_time, expected_time)
+
+def test_back_to_back_bookings_do_not_overlap():
+    # Two one-hour bookings, 09:00 and 10:00, never occupy the space together.
+    peak, peak_time = intraday_peaks.sweep_peaks(np.array([0, 0]), 1, np.array([9 * 3600, 10 * 3600]),
+                                                 np.array([3600, 3600]), 15)
+    assert peak.tolist() == [1]
+    assert peak_time.tolist() == [9 * 3600]
+
+def test_block_without_confirmed_bookings_has_no_peaks():
+    # refresh_intraday_peaks drops unconfirmed bookings first, so a block of
+    # no-shows reaches peaks_block empty.
+    bookings = pd.DataFrame({col: np.zeros(0, dtype=np.int64)
+                             for col in ['Day', 'Building_ID', 'Space_ID', 'Space_Type_ID', 'Time_Seconds']})
+    peaks = intraday_peaks.peaks_block(bookings, np.zeros(10, dtype=np.int64), np.full(5, 3600), 15)
+    assert peaks.empty
+    assert list(peaks.columns) == [*intraday_peaks.GROUP_COLUMNS, 'Peak_Occupancy', 'Peak_Time_Seconds']
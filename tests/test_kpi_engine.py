@@ -0,0 +1,50 @@
+
+
+import sqlite3
+import pytest
+import kpi_engine
+import memory_backend
+
+# The single-fetch KPIs must match the dashboard's original per-chart queries
+# over the raw bookings for every location level, date range and aggregation.
+
+@pytest.fixture(scope='module')
+def conn(tiny_db):
+    conn = sqlite3.connect(tiny_db)
+    yield conn
+    conn.close()
+
+@pytest.fixture(scope='module')
+def filter_selections(conn):
+    return list(kpi_engine.verification_filters(conn))
+
+@pytest.mark.parametrize('backend', ['sqlite', 'memory'])
+@pytest.mark.parametrize('agg_level', list(kpi_engine.AGG_FORMATS))
+def test_kpis_match_legacy_queries(conn, filter_selections, backend, agg_level):
+    store = memory_backend.load_store(conn) if backend == 'memory' else None
+    for filters in filter_selections:
+        if backend == 'memory':
+            data = memory_backend.fetch_kpi_data(store, filters)
+        else:
+            data = kpi_engine.fetch_kpi_data(conn, filters)
+        actual = dict(kpi_engine.summarize_kpis(data), occupancy_trend_df=kpi_engine.occupancy_trend(data, agg_level))
+        assert kpi_engine.compare_kpis(kpi_engine.legacy_kpis(conn, filters, agg_level), actual) == [], filters
+
+def test_verification_covers_every_location_level(filter_selections):
+    levels = {(f['country'] is not None, f['city'] is not None, f['building'] is not None) for f in filter_selections}
+    assert levels == {(False, False, False), (True, False, False), (True, True, False), (True, True, True)}
+
+def test_empty_selection(conn):
+    max_day = conn.execute("SELECT MAX(Day) FROM bookings").fetchone()[0]
+    filters = kpi_engine.build_filters(max_day + 10, max_day + 20)
+    kpis = kpi_engine.summarize_kpis(kpi_engine.fetch_kpi_data(conn, filters))
+    assert kpis['peak_occupancy'] == 0
+    assert kpis['avg_daily_users'] == 0
+
+def test_chart_fetchers_cover_their_queries(conn, filter_selections):
+    filters = filter_selections[0]
+    fetchers = kpi_engine.chart_fetchers(filters)
+    assert fetchers.keys() == kpi_engine.chart_queries(filters).keys()
+    data = {name: fetch(conn) for name, fetch in fetchers.items()}
+    assert not data['floor_peaks'].empty
+    assert data['bucket_minutes'] == 15
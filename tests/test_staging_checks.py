@@ -0,0 +1,70 @@
+
+
+import os
+import shutil
+import sqlite3
+import pytest
+import load_to_sqlite
+
+# check_staging only looks at the Day range a load wrote, so it has to catch
+# missing rows and orphaned bookings there without scanning the history.
+# Loads of the same database share its staging file, so only one may run.
+
+@pytest.fixture
+def staging(tiny_db, tmp_path):
+    staging_file = str(tmp_path / 'staging.db')
+    shutil.copyfile(tiny_db, staging_file)
+    conn = sqlite3.connect(staging_file)
+    yield conn.cursor()
+    conn.close()
+
+def last_week(cursor):
+    """Day -> booking count for the last seven days, as if they had just been loaded."""
+    return dict(cursor.execute("""
+        SELECT Day, COUNT(*) FROM bookings WHERE Day > (SELECT MAX(Day) - 7 FROM bookings) GROUP BY Day
+    """))
+
+def test_consistent_load_passes(staging):
+    loaded_days = last_week(staging)
+    assert load_to_sqlite.check_staging(staging, loaded_days, full=False) == []
+    assert load_to_sqlite.check_staging(staging, loaded_days, full=True) == []
+
+def test_missing_rows_are_reported(staging):
+    loaded_days = last_week(staging)
+    staging.execute("DELETE FROM bookings WHERE Booking_ID = (SELECT MAX(Booking_ID) FROM bookings WHERE Day = ?)",
+                    (max(loaded_days),))
+    problems = load_to_sqlite.check_staging(staging, loaded_days, full=False)
+    assert any('loaded day' in problem for problem in problems)
+    assert any(problem.startswith('booking_rollup') for problem in problems)
+
+def test_orphaned_bookings_are_reported(staging):
+    loaded_days = last_week(staging)
+    day = max(loaded_days)
+    staging.execute("""
+        INSERT INTO bookings (Day, Time_Seconds, Employee_ID, Space_ID, Building_ID, Space_Type_ID,
+                              Activity_Type_ID, Status_ID)
+        SELECT Day, Time_Seconds, -1, Space_ID, Building_ID, Space_Type_ID, Activity_Type_ID, Status_ID
+        FROM bookings WHERE Day = ? LIMIT 1
+    """, (day,))
+    loaded_days[day] += 1
+    problems = load_to_sqlite.check_staging(staging, loaded_days, full=False)
+    assert '1 foreign key violation(s) in bookings' in problems
+
+def test_second_load_is_refused_while_one_is_running(tiny_db, tmp_path):
+    db_file = str(tmp_path / 'live.db')
+    shutil.copyfile(tiny_db, db_file)
+    source = os.path.join(os.path.dirname(tiny_db), 'raw.csv')
+    staging_file = load_to_sqlite.staging_path(db_file)
+    lock_file = load_to_sqlite.acquire_load_lock(db_file)  # A load in progress
+    with open(staging_file, 'w') as f:
+        f.write('being written')
+
+    assert load_to_sqlite.populate_database(source, db_file, mode='replace') is False
+    with open(staging_file) as f:
+        assert f.read() == 'being written'
+    assert load_to_sqlite.read_load_lock(lock_file).startswith(str(os.getpid()))
+
+    os.remove(lock_file)
+    os.remove(staging_file)
+    assert load_to_sqlite.populate_database(source, db_file, mode='replace') is not False
+    assert not os.path.exists(lock_file)
@@ -0,0 +1,16 @@
+
+
+import pytest
+import benchmark
+
+# A cold dashboard session (fresh process, first render) must stay within
+# STARTUP_BUDGET_SECONDS without importing the on-demand modules, including
+# on databases shorter than the default date window.
+
+@pytest.mark.parametrize('db_fixture', ['tiny_db', 'short_db'])
+def test_cold_start_within_budget(request, tmp_path, db_fixture):
+    db_file = request.getfixturevalue(db_fixture)
+    startup = benchmark.check_startup(db_file, str(tmp_path / 'startup.log'))
+    assert startup['eager_imports'] == []
+    assert startup['within_budget'], (f"cold start took {startup['startup_seconds']}s, "
+                                      f"budget {startup['budget_seconds']}s")